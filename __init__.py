@@ -4,6 +4,12 @@ from .trend import *
 from .visualization import *
 from .financials import *
 from .krx import *
+from .resampling import *
+from .stats import *
+from .memory import *
+from .risk import *
+from .panel import *
+from .scanner import scan
 
 __doc__ = '''
 python library for quantitative analysis
@@ -0,0 +1,164 @@
+# 경로 의존적인 계산 커널
+# numba 가 설치되어 있으면 *_loop 구현을 JIT 컴파일한다. 없으면 Wilder 평활과 drawdown 기간은 같은 결과의 NumPy/pandas 구현을 쓰고,
+# 손절/익절/보유기간 포지션은 벡터화할 수 없어 _position_loop 를 파이썬 루프 그대로 실행한다 (행마다 반복하므로 느리다)
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _wilder_loop(x, w, seed_rows=2):
+    # x: 2-D array of dates x columns
+    n, k = x.shape
+    rst = np.full((n, k), np.nan)
+    for j in range(k):
+        # 컬럼마다 처음 완성된 w 구간부터 seed_rows 행은 단순이동평균, 이후는 재귀식
+        # NaN 행은 건너뛰고 (결과도 NaN) 다음 값에서 직전 평균으로 재귀를 이어간다
+        state = np.nan
+        seed = -1
+        run = 0
+        for i in range(n):
+            if x[i, j] != x[i, j]:
+                run = 0
+                continue
+            run += 1
+            if seed < 0 and run < w:
+                continue
+            if seed < 0 or i - seed < seed_rows:
+                s = 0.0
+                for r in range(i-w+1, i+1):
+                    s += x[r, j]
+                state = s / w
+                if seed < 0:
+                    seed = i
+            else:
+                state = (state * (w-1) + x[i, j]) / w
+            rst[i, j] = state
+    return rst
+
+
+def _wilder_numpy(x, w, seed_rows=2):
+    n, k = x.shape
+    sma = pd.DataFrame(x).rolling(w).mean().values
+    valid = ~np.isnan(x)
+    ready = ~np.isnan(sma)
+    seeded = ready.any(axis=0)
+    rst = np.full((n, k), np.nan)
+    if not seeded.any():
+        return rst
+    cols = np.flatnonzero(seeded)
+    first = ready[:, cols].argmax(axis=0)
+    # seed_rows 가 2 이고 다음 행도 값이 있으면 그 행의 단순이동평균에서 재귀를 시작한다
+    nxt = np.minimum(first + 1, n - 1)
+    start = np.where((seed_rows > 1) & (first + 1 < n) & valid[nxt, cols], nxt, first)
+    idx = np.arange(n)[:, None]
+    y = np.where(idx > start, x[:, cols], np.nan)
+    y[start, np.arange(len(cols))] = sma[start, cols]
+    # ignore_na 이면 NaN 행을 건너뛰고 직전 평균에서 (이전값*(w-1) + x) / w 를 이어간다
+    smooth = pd.DataFrame(y).ewm(alpha=1/w, adjust=False, ignore_na=True).mean().values
+    smooth[first, np.arange(len(cols))] = sma[first, cols]
+    smooth[(idx < first) | ~valid[:, cols]] = np.nan
+    rst[:, cols] = smooth
+    return rst
+
+
+def _position_loop(buy, price, stop_loss, take_profit, max_hold):
+    # 손절/익절/보유기간 초과로 청산되면 신호가 zero 로 바뀐 뒤 다시 buy 가 될 때까지 재진입하지 않는다
+    n = len(buy)
+    held = np.zeros(n, dtype=np.bool_)
+    holding = False
+    blocked = False
+    entry = np.nan
+    days = 0
+    for i in range(n):
+        if holding:
+            days += 1
+            stop = stop_loss == stop_loss and price[i] <= entry * (1 - stop_loss)
+            take = take_profit == take_profit and price[i] >= entry * (1 + take_profit)
+            expired = max_hold > 0 and days >= max_hold
+            if not buy[i] or stop or take or expired:
+                holding = False
+                blocked = buy[i]
+        elif not buy[i]:
+            blocked = False
+        elif not blocked:
+            holding = True
+            entry = price[i]
+            days = 0
+        held[i] = holding
+    return held
+
+
+def _drawdown_duration_loop(acc):
+    n, k = acc.shape
+    rst = np.zeros((n, k))
+    for j in range(k):
+        peak = -np.inf
+        last = 0
+        for i in range(n):
+            if acc[i, j] >= peak:
+                peak = acc[i, j]
+                last = i
+            rst[i, j] = i - last
+    return rst
+
+
+def _drawdown_duration_numpy(acc):
+    peak = acc >= np.fmax.accumulate(acc, axis=0)
+    idx = np.arange(len(acc))[:, None]
+    # 고점 위치만 남기고 누적최댓값을 취하면 각 시점의 직전 고점 위치가 된다
+    return (idx - np.maximum.accumulate(np.where(peak, idx, 0), axis=0)).astype(float)
+
+
+if njit is not None:
+    _wilder = njit(cache=True)(_wilder_loop)
+    _position = njit(cache=True)(_position_loop)
+    _drawdown_duration = njit(cache=True)(_drawdown_duration_loop)
+else:
+    _wilder = _wilder_numpy
+    _position = _position_loop
+    _drawdown_duration = _drawdown_duration_numpy
+
+
+def wilder(x, w, seed_rows=2):
+    '''
+    Wilder smoothing. Simple moving average on the first complete window of each column, then (previous*(w-1) + x) / w.
+    NaN rows are skipped and stay NaN
+    :param x: Array of dates or dates x columns
+    :param w: Window size
+    :param seed_rows: Number of rows of simple moving average from the first complete window. 1 for the standard Wilder
+        recursion, 2 for the rsi() of this library which also averages the row after the first window
+    :return: Smoothed array in the same shape as input
+    '''
+    a = np.asarray(x, dtype=float)
+    return _wilder(a.reshape(len(a), -1), int(w), int(seed_rows)).reshape(a.shape)
+
+
+def position(buy, price, stop_loss=None, take_profit=None, max_hold=None):
+    '''
+    Holding state of a long position with stop loss, take profit and holding period.
+    Without numba this runs as a per-row Python loop
+    :param buy: Boolean array of buy signals
+    :param price: Array of prices
+    :param stop_loss: Loss ratio from the entry price to exit. ex) .1
+    :param take_profit: Gain ratio from the entry price to exit
+    :param max_hold: Maximum number of rows to hold
+    :return: Boolean array of holding state
+    '''
+    return _position(np.asarray(buy, dtype=np.bool_), np.asarray(price, dtype=float),
+                     np.nan if stop_loss is None else float(stop_loss),
+                     np.nan if take_profit is None else float(take_profit),
+                     0 if max_hold is None else int(max_hold))
+
+
+def drawdown_duration(acc):
+    '''
+    Number of rows since the last high
+    :param acc: Array of dates or dates x columns of accumulated returns
+    :return: Array in the same shape as input
+    '''
+    a = np.asarray(acc, dtype=float)
+    return _drawdown_duration(a.reshape(len(a), -1)).reshape(a.shape)
@@ -1,36 +1,164 @@
 import pandas as pd
 import numpy as np
 import requests, json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .memory import compact
+except ImportError:
+    # run as a script: python data_prep.py
+    from memory import compact
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-def get_price(symbol, start_date=None, end_date=None, decimal_duex=True):
+
+def get_price(symbol, start_date=None, end_date=None, decimal_duex=True, decimals=2, dtype=None):
     '''
     :param symbol: Symbol or ticker of equity by finance.yahoo.com
     :param start_date: The first date of period
     :param end_date: The last date of period
     :param decimal_duex: Set false not to round up
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
     :return: Historical close prices
     '''
-    df = get_ohlc(symbol, start_date=start_date, end_date=end_date, decimal_duex=decimal_duex)
+    df = get_ohlc(symbol, start_date=start_date, end_date=end_date, decimal_duex=decimal_duex, decimals=decimals, dtype=dtype)
     df.rename(columns={'Adj Close':symbol}, inplace=True)
     return df[[symbol]]
 
 
-def get_ohlc(symbol, start_date=None, end_date=None, decimal_duex=True):
+def get_ohlc(symbol, start_date=None, end_date=None, decimal_duex=True, decimals=2, dtype=None):
     '''
     :param symbol: Symbol or ticker of equity by finance.yahoo.com
     :param start_date: The first date of period
     :param end_date: The last date of period
     :param decimal_duex: Set false not to round up
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
     :return: historical open, high, low, close prices and trade volume
     '''
     if isinstance(symbol, list):
         symbol = symbol[0]
     end_date = pd.to_datetime(end_date).date() if end_date else pd.Timestamp.today().date()
     start_date = pd.to_datetime(start_date).date() if start_date else (pd.Timestamp.today()-pd.DateOffset(months=1)).date()
-    df = _get_daily_price(symbol, start=start_date, end=end_date)
+    df = _get_daily_price(symbol, start=start_date, end=end_date, decimals=decimals)
     __decimal_formatter(decimal_duex)
-    return df
+    return compact(df, dtype)
+
+
+def get_quotes(symbols, batch=200, workers=4, decimals=2, dtype=None):
+    '''
+    :param symbols: Symbols or tickers of equities by finance.yahoo.com
+    :param batch: Number of symbols to request in a single call
+    :param workers: Number of batches to download concurrently
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
+    :return: Latest open, high, low, close prices, previous close, trade volume and quote time by symbol.
+        Error tells why a symbol has no quote
+    '''
+    if isinstance(symbols, str):
+        symbols = [symbols]
+    symbols = list(dict.fromkeys(symbols))
+    batches = [symbols[i:i+batch] for i in range(0, len(symbols), batch)]
+    results, errors = [], {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # a failed batch leaves its symbols empty with the reason instead of losing every other batch
+        for b, (rs, error) in zip(batches, pool.map(_quote_batch, batches)):
+            results += rs
+            errors.update(dict.fromkeys(b, error) if error else {})
+    df = _make_quotes(results, decimals=decimals)
+    df = df[~df.index.duplicated(keep='last')]
+    found = set(df.index)
+    keys = [_quote_key(s) for s in symbols]
+    # symbols not served by finance.yahoo.com are kept as NaN rows in the requested order
+    df = df.reindex(keys)
+    df['Error'] = [errors.get(s) or (None if k in found else 'Not found') for s, k in zip(symbols, keys)]
+    df.index = pd.Index(symbols, name='Symbol')
+    return compact(df, dtype)
+
+# max calendar days of intraday bars finance.yahoo.com serves per request
+_intraday_window = {'1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '60m': 730, '90m': 60, '1h': 730}
+
+
+def get_intraday(symbol, start_date=None, end_date=None, interval='5m', path=None, workers=4, decimals=2, dtype=None):
+    '''
+    :param symbol: Symbol or ticker of equity by finance.yahoo.com, or list of them
+    :param start_date: The first date of period
+    :param end_date: The last date of period
+    :param interval: Bar size (1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h)
+    :param path: Directory to stream the bars into as csv files. None to keep them in memory. dtype is not applicable to csv files
+    :param workers: Number of windows to download concurrently
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
+    :return: Intraday bars, dict of them by symbol for a list, or file paths when path is set
+    '''
+    if interval not in _intraday_window:
+        raise ValueError('interval should be one of {}'.format(list(_intraday_window)))
+    if path and dtype is not None:
+        raise ValueError('dtype is not applicable when the bars are written to csv files in path')
+    end_date = pd.to_datetime(end_date).date() if end_date else pd.Timestamp.today().date()
+    start_date = pd.to_datetime(start_date).date() if start_date else end_date - pd.Timedelta(days=_intraday_window[interval] - 1)
+    if start_date > end_date:
+        raise ValueError('start_date {} is after end_date {}'.format(start_date, end_date))
+    windows = _split_windows(start_date, end_date, _intraday_window[interval])
+    if path:
+        os.makedirs(path, exist_ok=True)
+    symbols = symbol if isinstance(symbol, list) else [symbol]
+    rst = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for s in symbols:
+            fetch = lambda start, end: _get_daily_price(s, interval=interval, start=start, end=end, decimals=decimals)
+            chunks = _iter_chunks(pool, workers, fetch, windows)
+            if path:
+                rst[s] = _write_chunks(chunks, os.path.join(path, '{}_{}.csv'.format(s, interval)))
+            else:
+                rst[s] = compact(_concat_chunks(chunks), dtype)
+    return rst if isinstance(symbol, list) else rst[symbol]
+
+
+def _split_windows(start, end, days):
+    starts = pd.date_range(start, end, freq='{}D'.format(days))
+    ends = [min(s + pd.Timedelta(days=days - 1), pd.Timestamp(end)) for s in starts]
+    return list(zip(starts, ends))
+
+
+def _iter_chunks(pool, workers, fetch, windows):
+    # yields chunks in window order while keeping at most `workers` downloads in flight,
+    # so only a bounded number of chunks is held in memory at any time
+    pending = deque()
+    for w in windows:
+        pending.append(pool.submit(fetch, *w))
+        if len(pending) >= workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _concat_chunks(chunks):
+    df = pd.concat(list(chunks))
+    df = df[~df.index.duplicated(keep='last')]
+    return df.sort_index()
+
+
+def _write_chunks(chunks, file):
+    last = None
+    for df in chunks:
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        if last is not None:
+            df = df[df.index > last]
+        if len(df) > 0:
+            df.to_csv(file, mode='w' if last is None else 'a', header=last is None, index_label='Date')
+            last = df.index[-1]
+    if last is None:
+        pd.DataFrame(columns=_ohlc_fields).to_csv(file, index_label='Date')
+    return file
 
 
 def _get_multiple_prices(symbols, dates):
@@ -74,7 +202,92 @@ headers = {
 }
 
 
-def _get_daily_price(symbol, interval='1d', range=None, start=None, end=None):
+def set_price_cache(maxsize=128, ttl=900):
+    '''
+    Configure the in-memory cache of daily price downloads
+    :param maxsize: Number of symbol and interval pairs to keep. 0 to disable the cache
+    :param ttl: Seconds before a cached range including today is downloaded again
+    :return: None
+    '''
+    global _cache_size, _cache_ttl
+    _cache_size, _cache_ttl = maxsize, ttl
+    with _cache_lock:
+        _trim_cache()
+
+
+def clear_price_cache():
+    '''
+    Remove all cached price downloads
+    :return: None
+    '''
+    with _cache_lock:
+        _price_cache.clear()
+        for key in list(_key_locks):
+            _drop_key_lock(key)
+
+
+_cache_size = 128
+_cache_ttl = 900
+_price_cache = OrderedDict()    # (symbol, interval, decimals) -> (data, start, end, downloaded time)
+_cache_lock = threading.Lock()
+_key_locks = {}
+_default_start = pd.Timestamp('2000-01-01')
+
+
+def _get_daily_price(symbol, interval='1d', range=None, start=None, end=None, decimals=2):
+    if range or _cache_size < 1 or interval in _intraday_granularity:
+        return _download_price(symbol, interval=interval, range=range, start=start, end=end, decimals=decimals)
+    key = (symbol, interval, decimals)
+    today = pd.Timestamp.today().normalize()
+    start = pd.Timestamp(start).normalize() if start else _default_start
+    end = pd.Timestamp(end).normalize() if end else today
+
+    with _cache_lock:
+        lock = _key_locks.setdefault(key, threading.Lock())
+    try:
+        # identical requests from other threads wait here and are served from the cache afterwards
+        with lock:
+            with _cache_lock:
+                cached = _price_cache.get(key)
+                if cached is not None:
+                    _price_cache.move_to_end(key)
+            if cached is not None:
+                data, c_start, c_end, stamp = cached
+                # the bar of the download day may have been partial, so a range reaching that day expires with ttl
+                fresh = end < pd.Timestamp.fromtimestamp(stamp).normalize() or time.time() - stamp < _cache_ttl
+                if c_start <= start and end <= c_end and fresh:
+                    return data.loc[start:end].copy()
+                # download the union so the cache keeps covering the earlier range as well
+                lo, hi = min(start, c_start), max(end, c_end)
+            else:
+                lo, hi = start, end
+            data = _download_price(symbol, interval=interval, start=lo, end=hi, decimals=decimals)
+            with _cache_lock:
+                _price_cache[key] = (data, lo, hi, time.time())
+                _price_cache.move_to_end(key)
+                _trim_cache()
+    finally:
+        with _cache_lock:
+            if key not in _price_cache:
+                _drop_key_lock(key)
+    return data.loc[start:end].copy()
+
+
+def _trim_cache():
+    # called with _cache_lock held
+    while len(_price_cache) > _cache_size:
+        key, _ = _price_cache.popitem(last=False)
+        _drop_key_lock(key)
+
+
+def _drop_key_lock(key):
+    # a lock still held by a download stays until that download puts its key back into the cache
+    lock = _key_locks.get(key)
+    if lock is not None and not lock.locked():
+        del _key_locks[key]
+
+
+def _download_price(symbol, interval='1d', range=None, start=None, end=None, decimals=2):
     symbol = symbol.replace('.','-')
     params = {
         'region': 'US',
@@ -88,32 +301,144 @@ def _get_daily_price(symbol, interval='1d', range=None, start=None, end=None):
     }
     url = 'https://query1.finance.yahoo.com/v8/finance/chart/{}'.format(symbol)
     r = requests.get(url, headers=headers, params=params)
-    raw = json.loads(r.text)
-    rst = _make_ohlc(raw)
+    raw = _json_loads(r.content)
+    rst = _make_ohlc(raw, decimals=decimals)
     return rst
 
 
-def _make_ohlc(raw):
-    time_offset = raw['chart']['result'][0]['meta']['gmtoffset']
-    times = pd.to_datetime([x + time_offset for x in raw['chart']['result'][0]['timestamp']], unit='s').date
-    open = raw['chart']['result'][0]['indicators']['quote'][0]['open']
-    high = raw['chart']['result'][0]['indicators']['quote'][0]['high']
-    low = raw['chart']['result'][0]['indicators']['quote'][0]['low']
-    close = raw['chart']['result'][0]['indicators']['quote'][0]['close']
-    adj_close = raw['chart']['result'][0]['indicators']['adjclose'][0]['adjclose']
-    volume = raw['chart']['result'][0]['indicators']['quote'][0]['volume']
-    d = {
-        'Open': open,
-        'High': high,
-        'Low': low,
-        'Close': close,
-        'Volume': volume,
-        'Adj Close': adj_close,
+_quote_session = None    # (session with the finance.yahoo.com cookie, crumb)
+_quote_lock = threading.Lock()
+
+
+def _yahoo_session(refresh=False):
+    # the quote api requires the cookie of finance.yahoo.com and the crumb issued with it
+    global _quote_session
+    with _quote_lock:
+        if _quote_session is None or refresh:
+            session = requests.Session()
+            session.headers.update(headers)
+            try:
+                # fc.yahoo.com sets the cookie even though it answers 404
+                session.get('https://fc.yahoo.com')
+            except requests.RequestException:
+                pass
+            r = session.get('https://query1.finance.yahoo.com/v1/test/getcrumb')
+            _quote_session = (session, r.text.strip() if r.status_code == 200 else None)
+        return _quote_session
+
+
+def _quote_key(symbol):
+    return symbol.replace('.','-').upper()
+
+
+def _quote_batch(symbols):
+    try:
+        return _download_quotes(symbols), None
+    except (requests.RequestException, ValueError, KeyError) as e:
+        return [], str(e)
+
+
+def _download_quotes(symbols):
+    url = 'https://query1.finance.yahoo.com/v7/finance/quote'
+    for retry in (False, True):
+        session, crumb = _yahoo_session(refresh=retry)
+        params = {
+            'region': 'US',
+            'corsDomain': 'finance.yahoo.com',
+            'symbols': ','.join(_quote_key(s) for s in symbols),
+        }
+        if crumb:
+            params['crumb'] = crumb
+        r = session.get(url, params=params)
+        # an expired cookie or crumb is answered with 401, so renew it once
+        if r.status_code != 401:
+            break
+    try:
+        raw = _json_loads(r.content)
+    except ValueError:
+        raw = {}
+    raw = raw if isinstance(raw, dict) else {}
+    response = raw.get('quoteResponse') or {}
+    error = response.get('error') or (raw.get('finance') or {}).get('error')
+    if r.status_code != 200 or error or 'result' not in response:
+        error = error.get('description', error) if isinstance(error, dict) else error
+        raise ValueError('HTTP {}: {}'.format(r.status_code, error or 'no quote in the response'))
+    return response['result'] or []
+
+
+_quote_fields = {
+    'regularMarketOpen': 'Open',
+    'regularMarketDayHigh': 'High',
+    'regularMarketDayLow': 'Low',
+    'regularMarketPrice': 'Close',
+    'regularMarketPreviousClose': 'Previous Close',
+    'regularMarketVolume': 'Volume',
+    'regularMarketTime': 'Time',
+}
+
+
+def _make_quotes(results, decimals=2):
+    '''
+    Parse the quote response of finance.yahoo.com into a dataframe
+    :param results: List of quotes in the decoded json of the quote api
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :return: Latest open, high, low, close prices, previous close, trade volume and quote time by symbol
+    '''
+    # one record conversion for every quote; missing keys become NaN
+    raw = pd.DataFrame.from_records(results, columns=['symbol', 'gmtOffSetMilliseconds'] + list(_quote_fields))
+    df = raw[list(_quote_fields)].rename(columns=_quote_fields).astype(float)
+    df.index = pd.Index(raw['symbol'].astype(str).str.upper(), name='Symbol')
+    if decimals is not None:
+        prices = ['Open', 'High', 'Low', 'Close', 'Previous Close']
+        df[prices] = df[prices].round(decimals)
+    if df['Volume'].notna().all():
+        df['Volume'] = df['Volume'].astype('int64')
+    # exchange local time
+    offset = raw['gmtOffSetMilliseconds'].fillna(0).values.astype('int64') // 1000
+    df['Time'] = pd.to_datetime(df['Time'].values + offset, unit='s')
+    return df
+
+
+_ohlc_fields = ['Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+_intraday_granularity = ('1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h')
+
+
+def _make_ohlc(raw, decimals=2):
+    '''
+    Parse the chart response of finance.yahoo.com into an OHLC dataframe
+    :param raw: Decoded json of the chart api
+    :param decimals: Number of decimal places to round prices to. None not to round
+    :return: historical open, high, low, close prices and trade volume
+    '''
+    result = raw['chart']['result'][0]
+    meta = result['meta']
+    stamps = result.get('timestamp')
+    if not stamps:
+        return pd.DataFrame(columns=_ohlc_fields, index=pd.DatetimeIndex([]), dtype=float)
+
+    # nulls become NaN in the single float conversion
+    quote = result['indicators']['quote'][0]
+    adj = result['indicators'].get('adjclose')
+    cols = {
+        'Open': np.array(quote['open'], dtype=float),
+        'High': np.array(quote['high'], dtype=float),
+        'Low': np.array(quote['low'], dtype=float),
+        'Close': np.array(quote['close'], dtype=float),
+        'Volume': np.array(quote['volume'], dtype=float),
     }
-    data = pd.DataFrame(d, index=times)
-    data.index = pd.to_datetime(data.index)
-    data = data.round(2)
-    return data
+    if not np.isnan(cols['Volume']).any():
+        cols['Volume'] = cols['Volume'].astype('int64')
+    cols['Adj Close'] = np.array(adj[0]['adjclose'], dtype=float) if adj else cols['Close'].copy()
+    if decimals is not None:
+        for c in ['Open', 'High', 'Low', 'Close', 'Adj Close']:
+            np.round(cols[c], decimals, out=cols[c])
+
+    # exchange local time; daily and coarser bars are truncated to dates
+    times = (np.array(stamps, dtype='int64') + meta['gmtoffset']).astype('datetime64[s]')
+    if meta.get('dataGranularity') not in _intraday_granularity:
+        times = times.astype('datetime64[D]')
+    index = pd.DatetimeIndex(times.astype('datetime64[ns]'))
+    return pd.DataFrame(cols, index=index, columns=_ohlc_fields)
 
 
 if __name__ == '__main__':
@@ -2,6 +2,8 @@ import requests
 import pandas as pd
 import numpy as np
 import warnings
+from numpy.lib.stride_tricks import sliding_window_view
+from .memory import compact
 warnings.filterwarnings('ignore')
 
 
@@ -22,12 +24,13 @@ def set_terms(trade_start, trade_end):
     return fiscal_terms
 
 
-def fn_consolidated(otp, symbol='', term='', vol=100000, study='N'):
+def fn_consolidated(otp, symbol='', term='', vol=100000, study='N', dtype=None):
     '''
     :param otp: One time passcode to access the finterstellar.com api
     :param symbol: Symbol or ticker of equity by finance.yahoo.com
     :param term: Term name in quarters format to retrieve financial data
     :param vol: Average volume
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
     :return: The consolidate financial data of whole equities in designated term
     '''
     if term!='' or symbol!='':
@@ -41,18 +44,20 @@ def fn_consolidated(otp, symbol='', term='', vol=100000, study='N'):
             df.set_index('symbol', inplace=True)
             # df = df[~(pd.isna(df['Revenue'])|pd.isna(df['Price']))].fillna(0).copy()
             print('OK')
-            return df
         except:
             print('Failed')
+            return
+        return compact(df, dtype)
     else:
         return 'Either symbol or term is required.'
 
 
-def fn_single(otp, symbol='', window='T'):
+def fn_single(otp, symbol='', window='T', dtype=None):
     '''
     :param otp: One time passcode to access the finterstellar.com api
     :param symbol: Symbol or ticker of equity by finance.yahoo.com
     :param window: The way how to summarize financial data (Q:Quarterly, Y:Yearly, T:TTM)
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text, 'arrow' for arrow-backed columns
     :return: The financial data of a company
     '''
     url = 'https://api.finterstellar.com/api/single?otp={}&symbol={}&window={}'.format(otp, symbol, window)
@@ -64,9 +69,10 @@ def fn_single(otp, symbol='', window='T'):
         else:
             df['Current Debt'] = 0
         df = df[~(pd.isna(df['Revenue'])|pd.isna(df['Price']))].fillna(0).copy()
-        return df
     except:
         print(r.text)
+        return
+    return compact(df, dtype)
 
 
 def fn_filter(df, by='PER', floor=-np.inf, cap=np.inf, n=None, asc=True):
@@ -149,7 +155,7 @@ def combine_score(*signals, n=None):
     return signal.sort_values(by='Sum', ascending=False)[:n]
 
 
-def backtest(signal, data, m=3, cost=.001, rf_rate=.01):
+def backtest(signal, data, m=3, cost=.001, rf_rate=.01, verbose=True, weight='equal', daily_prices=None, scores=None, window=252):
     '''
 
     :param signal: Data set storing trading signal
@@ -157,6 +163,11 @@ def backtest(signal, data, m=3, cost=.001, rf_rate=.01):
     :param m: Rebalancing date in month unit after the quarter end
     :param cost: Cost of transaction
     :param rf_rate: Risk free rate
+    :param verbose: Set false not to print the result
+    :param weight: Weighting of selected stocks. 'equal', 'score', 'inverse_vol', 'min_variance' or 'risk_parity'
+    :param daily_prices: Dataframe of dates x symbols of daily prices to estimate covariance
+    :param scores: Dictionary of term and scores of stocks for score weighting
+    :param window: Number of days to estimate covariance
     :return: Trading result such as Return, CAGR, Test period, Sharpe ratio, MDD
     '''
     # 포트폴리오 종목 세팅
@@ -207,6 +218,17 @@ def backtest(signal, data, m=3, cost=.001, rf_rate=.01):
     # rtn['term_rtn'] = rtn.replace(1.0, np.nan).mean(axis=1).replace(np.nan, 1.0)
     n = max([len(signal[x]) for x in list(signal.keys())])
     rtn['term_rtn'] = ( rtn.replace(1.0, np.nan).sum(axis=1) + (n - rtn.replace(1.0, np.nan).count(axis=1)) ) / n
+    if weight != 'equal':
+        # 직전 리밸런싱 비중으로 보유한 수익률을 합산하고, 비중 변화로 매도한 만큼 비용 반영
+        w = portfolio_weights(signal, prices=daily_prices, m=m, method=weight, scores=scores, window=window).reindex(columns=position.columns)
+        gross = (prices_filtered / prices_filtered.shift(1)).where(prev == 'l')
+        gross = gross.replace([np.inf, -np.inf, 0.0], np.nan).fillna(1)
+        w_prev = w.shift(1).fillna(0)
+        held = w_prev * gross
+        port = held.sum(axis=1) + (1 - w_prev.sum(axis=1))
+        drift = held.div(port, axis=0)
+        rtn['turnover'] = (w - drift).abs().sum(axis=1)
+        rtn['term_rtn'] = port * (1 - cost * (drift - w).clip(lower=0).sum(axis=1))
     rtn['acc_rtn'] = rtn['term_rtn'].cumprod()
     rtn['dd'] = rtn['acc_rtn'] / rtn['acc_rtn'].cummax()
     rtn['mdd'] = rtn['dd'].cummin()
@@ -217,8 +239,141 @@ def backtest(signal, data, m=3, cost=.001, rf_rate=.01):
         tq.append((pd.Period(q) + 1).strftime('%YQ%q'))
     rtn.index = tq
 
-    rst = {}
+    rst = _backtest_summary(rtn, rf_rate, verbose)
     rst['position'] = position
+    return rtn
+    # return rtn, prices, position, prices_filtered, position_cal, inclusive
+
+
+def portfolio_weights(signal, prices=None, m=3, method='equal', scores=None, window=252):
+    '''
+    Weights of selected stocks at each rebalancing
+    :param signal: Data set storing trading signal
+    :param prices: Dataframe of dates x symbols of daily prices to estimate covariance
+    :param m: Rebalancing date in month unit after the quarter end
+    :param method: 'equal', 'score', 'inverse_vol', 'min_variance' or 'risk_parity'
+    :param scores: Dictionary of term and scores of stocks for score weighting. ex) Score of fn_score(), Sum of combine_score()
+    :param window: Number of days to estimate covariance
+    :return: Dataframe of terms x symbols of weights
+    '''
+    terms = list(signal.keys())
+    symbols = list(dict.fromkeys(s for v in signal.values() for s in v))
+    mask = pd.DataFrame(False, index=terms, columns=symbols)
+    for k, v in signal.items():
+        mask.loc[k, list(v)] = True
+
+    if method == 'equal':
+        # backtest() 와 같이 최대 편입 종목 수로 나누고 남는 비중은 현금
+        w = mask / max(len(v) for v in signal.values())
+        return w.astype(float)
+    if method == 'score':
+        if scores is None:
+            raise ValueError('scores is required for score weighting')
+        sc = pd.DataFrame({k: (scores[k].iloc[:, -1] if isinstance(scores[k], pd.DataFrame) else pd.Series(scores[k]))
+                           for k in terms}).T.reindex(index=terms, columns=symbols)
+        w = sc.clip(lower=0).where(mask, 0).fillna(0)
+        return w.div(w.sum(axis=1).replace(0, np.nan), axis=0).fillna(0)
+    if method not in ('inverse_vol', 'min_variance', 'risk_parity'):
+        raise ValueError("method should be one of 'equal', 'score', 'inverse_vol', 'min_variance', 'risk_parity'")
+    if prices is None:
+        raise ValueError('prices is required for {} weighting'.format(method))
+    cov = _rebalance_covariances(prices, terms, symbols, m, window)
+    return pd.DataFrame(_covariance_weights(cov, mask.values, method), index=terms, columns=symbols)
+
+
+def _rebalance_covariances(prices, terms, symbols, m, window):
+    # 모든 리밸런싱일의 직전 window 일 수익률을 한 번에 잘라 공분산을 배치 계산
+    r = prices.reindex(columns=symbols).pct_change().values
+    dates = [pd.Period(t).end_time.normalize() + pd.DateOffset(months=m) for t in terms]
+    ends = pd.DatetimeIndex(prices.index).searchsorted(dates, side='right')
+    r = np.vstack([np.full((window, len(symbols)), np.nan), r])
+    x = sliding_window_view(r, window, axis=0)[ends]    # rebalancings x symbols x days
+    valid = ~np.isnan(x)
+    with np.errstate(invalid='ignore'):
+        x = np.where(valid, x - np.nanmean(np.where(valid, x, np.nan), axis=2, keepdims=True), 0)
+    count = np.einsum('jiw,jkw->jik', valid.astype(float), valid.astype(float))
+    return np.einsum('jiw,jkw->jik', x, x) / np.maximum(count - 1, 1)
+
+
+def _covariance_weights(cov, mask, method, iters=100):
+    size = max(int(mask.sum(axis=1).max()), 1)
+    rows = np.arange(len(mask))[:, None]
+    # 기마다 편입 종목을 앞으로 모아 같은 크기의 부분 공분산 행렬로 맞춘다
+    order = np.argsort(~mask, axis=1, kind='stable')[:, :size]
+    valid = mask[rows, order] & (cov[rows, order, order] > 0)
+    sub = cov[rows[:, :, None], order[:, :, None], order[:, None, :]]
+    sub = np.where(valid[:, :, None] & valid[:, None, :], sub, np.eye(size))
+    var = np.diagonal(sub, axis1=1, axis2=2)
+
+    if method == 'min_variance':
+        w = _min_variance_weights(sub, valid)
+    else:
+        w = np.where(valid, 1 / np.sqrt(var), 0)
+        if method == 'risk_parity':
+            # w_i * (Σw)_i 가 같아지는 고정점으로 반복
+            for _ in range(iters):
+                w = w / np.maximum(w.sum(axis=1, keepdims=True), 1e-12)
+                w = np.sqrt(w / np.maximum(np.einsum('jik,jk->ji', sub, w), 1e-12)) * valid
+    w = w / np.maximum(w.sum(axis=1, keepdims=True), 1e-12)
+
+    rst = np.zeros(mask.shape)
+    np.put_along_axis(rst, order, w, axis=1)
+    return rst
+
+
+def _min_variance_weights(sub, valid, iters=2000, tol=1e-12):
+    # 공매도 없는 최소분산: 모든 기를 한 번에 가속 사영경사법(FISTA)으로 풀고 매 단계 단체(simplex)로 사영
+    step = 1 / (2 * np.maximum(np.linalg.eigvalsh(sub)[:, -1], 1e-12))[:, None]
+    w = _project_simplex(np.where(valid, 1., 0), valid)
+    y, t = w, np.ones((len(sub), 1))
+    for _ in range(iters):
+        prev = w
+        w = _project_simplex(y - step * 2 * np.einsum('jik,jk->ji', sub, y), valid)
+        # 관성이 하강 방향을 벗어난 기는 모멘텀을 초기화(restart)
+        restart = (np.einsum('ji,ji->j', y - w, w - prev) > 0)[:, None]
+        t_next = np.where(restart, 1., (1 + np.sqrt(1 + 4 * t * t)) / 2)
+        y = w + (t - 1) / t_next * (w - prev) * ~restart
+        t = t_next
+        if np.abs(w - prev).max() < tol:
+            break
+    # 찾은 편입 구간에서 시작해 등식 제약 해를 풀며 음수 종목은 빼고 KKT 를 어기는 종목은 더하는 active set 보정
+    support = w > 1e-6
+    exact = np.zeros((len(sub), 1), dtype=bool)
+    x = w
+    for _ in range(sub.shape[1] * 2):
+        a = np.where(support[:, :, None] & support[:, None, :], sub, np.eye(sub.shape[1]))
+        # 편입 종목의 공분산이 특이(구간이 종목 수보다 짧거나 같은 시계열)해도 풀리도록 pinv 를 쓴다
+        x = (np.linalg.pinv(a) @ support[:, :, None].astype(float))[:, :, 0] * support
+        total = x.sum(axis=1, keepdims=True)
+        solved = ~support.any(axis=1, keepdims=True) | (total > 1e-12)
+        x = x / np.where(solved & support.any(axis=1, keepdims=True), total, 1)
+        grad = np.einsum('jik,jk->ji', sub, x)
+        level = (grad * x).sum(axis=1, keepdims=True)
+        negative = support & (x < 0)
+        violation = np.where(valid & ~support, level - grad, 0)
+        exact = solved & ~negative.any(axis=1, keepdims=True) & (violation <= level * 1e-9).all(axis=1, keepdims=True)
+        if exact.all():
+            break
+        worst = violation == violation.max(axis=1, keepdims=True)
+        support = np.where(negative.any(axis=1, keepdims=True), support & ~negative,
+                           support | (worst & (violation > level * 1e-9)))
+    return np.where(exact, np.maximum(x, 0), w)
+
+
+def _project_simplex(v, valid):
+    # 편입 종목만으로 합이 1, 음수가 없는 가장 가까운 비중. 편입 종목이 없는 기는 0
+    u = -np.sort(-np.where(valid, v, -np.inf), axis=1)
+    n = valid.sum(axis=1, keepdims=True)
+    j = np.arange(1, v.shape[1] + 1)
+    css = np.cumsum(np.where(j <= n, u, 0), axis=1)
+    rho = ((u - (css - 1) / j > 0) & (j <= n)).sum(axis=1, keepdims=True)
+    theta = np.take_along_axis(css, np.maximum(rho - 1, 0), axis=1) - 1
+    theta = theta / np.maximum(rho, 1)
+    return np.where(valid, np.maximum(v - theta, 0), 0)
+
+
+def _backtest_summary(rtn, rf_rate=.01, verbose=True):
+    rst = {}
     rst['rtn'] = rtn
 
     period = __get_period(rtn)
@@ -234,13 +389,130 @@ def backtest(signal, data, m=3, cost=.001, rf_rate=.01):
     rst['portfolio_rtn_annual'] = rst['portfolio_rtn'] ** (1/period) if period > 1 \
         else (rst['portfolio_rtn']-1) * (1/period) + 1
 
-    print('CAGR: {:.2%}'.format(rst['portfolio_rtn_annual'] - 1))
-    print('Accumulated return: {:.2%}'.format(rst['portfolio_rtn'] - 1))
-    print('Investment period: {:.1f}yrs'.format(rst['period']))
-    print('Sharpe ratio: {:.2f}'.format(rst['sharpe']))
-    print('MDD: {:.2%}'.format(rst['mdd'] - 1))
-    return rtn
-    # return rtn, prices, position, prices_filtered, position_cal, inclusive
+    if verbose:
+        print('CAGR: {:.2%}'.format(rst['portfolio_rtn_annual'] - 1))
+        print('Accumulated return: {:.2%}'.format(rst['portfolio_rtn'] - 1))
+        print('Investment period: {:.1f}yrs'.format(rst['period']))
+        print('Sharpe ratio: {:.2f}'.format(rst['sharpe']))
+        print('MDD: {:.2%}'.format(rst['mdd'] - 1))
+    return rst
+
+
+class BacktestState:
+    '''
+    Running state of backtest() that appends one term at a time
+    :param m: Rebalancing date in month unit after the quarter end
+    :param cost: Cost of transaction
+    :param rf_rate: Risk free rate
+    '''
+    def __init__(self, m=3, cost=.001, rf_rate=.01):
+        self.m = m
+        self.cost = cost
+        self.rf_rate = rf_rate
+        self.terms = []
+        self.symbols = {}       # 한 번이라도 편입된 종목 (편입 순서 유지)
+        self.held = {}          # 직전 기 보유종목과 매수(리밸런싱) 가격
+        self.rows = []          # 기별 종목 수익률 (1이 아닌 값만)
+        self.sums = []          # 기별 1이 아닌 수익률 합
+        self.counts = []        # 기별 1이 아닌 수익률 개수
+        self.n = 0              # 기별 최대 편입 종목 수
+        self._replay()
+
+    @classmethod
+    def from_signal(cls, signal, data, m=3, cost=.001, rf_rate=.01):
+        '''
+        Build the state from the whole history
+        :param signal: Data set storing trading signal
+        :param data: Dataframe storing financial data to be tested
+        :return: BacktestState of the last term
+        '''
+        state = cls(m=m, cost=cost, rf_rate=rf_rate)
+        for k, v in signal.items():
+            state.update(k, v, data[k])
+        return state
+
+    def update(self, term, selection, data):
+        '''
+        Append the next term
+        :param term: Term name in quarters format
+        :param selection: The stocks selected in the term
+        :param data: Dataframe storing financial data of the term, or Series of prices by symbol
+        :return: Return of the term
+        '''
+        prices = data[_price_columns[self.m]] if isinstance(data, pd.DataFrame) else data
+        size = len(selection)
+        selection = list(dict.fromkeys(selection))
+        row = {}
+        for s in set(self.held) | set(selection):
+            price = prices.get(s, np.nan)
+            if s in self.held:
+                r = price * (1 if s in selection else 1-self.cost) / self.held[s]
+                if np.isfinite(r) and r != 0 and r != 1:
+                    row[s] = r
+        self.held = {s: prices.get(s, np.nan) for s in selection}
+        for s in selection:
+            self.symbols.setdefault(s, None)
+
+        self.terms.append(term)
+        self.rows.append(row)
+        self.sums.append(sum(row.values()))
+        self.counts.append(len(row))
+        if size > self.n:
+            # 최대 편입 종목 수가 바뀌면 과거 기별 수익률도 달라지므로 누적값을 다시 계산
+            self.n = size
+            self._replay()
+        else:
+            self._step(self._term_rtn(len(self.terms)-1))
+        return self._term_rtn(len(self.terms)-1)
+
+    def _term_rtn(self, i):
+        return (self.sums[i] + self.n - self.counts[i]) / self.n
+
+    def _step(self, term_rtn):
+        self.acc_rtn *= term_rtn
+        self.peak = max(self.peak, self.acc_rtn)
+        self.mdd = min(self.mdd, self.acc_rtn / self.peak)
+
+    def _replay(self):
+        self.acc_rtn, self.peak, self.mdd = 1.0, -np.inf, np.inf
+        for i in range(len(self.terms)):
+            self._step(self._term_rtn(i))
+
+    @property
+    def rtn(self):
+        '''
+        Trading result in the same format as backtest()
+        '''
+        rtn = pd.DataFrame(self.rows, index=self.terms, columns=list(self.symbols)).fillna(1.0)
+        rtn['term_rtn'] = [self._term_rtn(i) for i in range(len(self.terms))]
+        rtn['acc_rtn'] = rtn['term_rtn'].cumprod()
+        rtn['dd'] = rtn['acc_rtn'] / rtn['acc_rtn'].cummax()
+        rtn['mdd'] = rtn['dd'].cummin()
+        rtn.index = [(pd.Period(q) + 1).strftime('%YQ%q') for q in rtn.index]
+        return rtn
+
+    def summary(self, verbose=True):
+        '''
+        Calculate Return, CAGR, Test period, Sharpe ratio, MDD like backtest()
+        :param verbose: Set false not to print the result
+        :return: Dictionary of the result
+        '''
+        return _backtest_summary(self.rtn, self.rf_rate, verbose)
+
+    def portfolio(self, prices=None):
+        '''
+        Current holdings of the portfolio
+        :param prices: Series of current prices by symbol to calculate unrealized returns
+        :return: Dataframe of the holdings and their rebalancing prices
+        '''
+        rst = pd.DataFrame({'Price': pd.Series(self.held, dtype=float)})
+        if prices is not None:
+            rst['Current'] = prices.reindex(rst.index)
+            rst['rtn'] = rst['Current'] / rst['Price']
+        return rst
+
+
+_price_columns = {0:'Price', 1:'Price_M1', 2:'Price_M2', 3:'Price_M3'}
 
 
 def __get_sharpe_ratio(df, rf_rate=.01):
@@ -319,3 +591,103 @@ def view_portfolio(data, signal, term=None):
     '''
     t = term if term else list(data.keys())[-1]
     return data[t].loc[signal[t]][['name','sector','industry','avg_volume']].sort_values(by=['sector','industry'])
+
+
+def fn_multiple_band(data, multiple='PER', acct=None, start='2012Q1', positive=True):
+    '''
+    Historical price multiple band of every company in one pass
+    :param data: Dictionary of term and financial data, or dataframe with term and symbol columns
+    :param multiple: Price multiple (PER, PBR, PSR)
+    :param acct: Per share account to divide the price by. Default account of the multiple if not given
+    :param start: The first term of period
+    :param positive: Set false to keep zero and negative multiples
+    :return: Current multiple, min, quartiles and max of each company, the band lines of draw_price_multiple_band
+        (quarter points of the min-max range) and the position of the current multiple in the range and in the history
+    '''
+    df = _term_symbol_panel(data)
+    df = df[df['term'] >= start].sort_values(['symbol', 'term'])
+    df['multiple'] = _price_multiple(df, multiple, acct).replace([-np.inf, np.inf], np.nan)
+    if positive:
+        df['multiple'] = df['multiple'].where(df['multiple'] > 0)
+    df = df.dropna(subset=['multiple'])
+    df['percentile'] = df.groupby('symbol')['multiple'].rank(pct=True)
+
+    g = df.groupby('symbol')
+    rst = g['multiple'].agg(['min', 'max', 'count'])
+    last = g[['term', 'multiple', 'percentile']].last()
+    q = g['multiple'].quantile([.25, .5, .75]).unstack()
+    rst['q25'], rst['median'], rst['q75'] = q[.25], q[.5], q[.75]
+    # draw_price_multiple_band 의 밴드선: 최소~최대 구간을 4등분한 지점
+    span = rst['max'] - rst['min']
+    rst['range_25'] = rst['min'] + span / 4
+    rst['range_50'] = rst['min'] + span / 2
+    rst['range_75'] = rst['min'] + span / 4 * 3
+    rst['term'] = last['term']
+    rst['current'] = last['multiple']
+    rst['position'] = ((rst['current'] - rst['min']) / span.where(span > 0)).fillna(0)
+    rst['percentile'] = last['percentile']
+    return rst[['term', 'current', 'min', 'q25', 'median', 'q75', 'max', 'range_25', 'range_50', 'range_75',
+                'position', 'percentile', 'count']]
+
+
+def _term_symbol_panel(data):
+    if isinstance(data, dict):
+        df = pd.concat(data, names=['term_', 'symbol']).reset_index()
+        df['term'] = df['term_']
+        return df.drop(columns='term_')
+    return data.reset_index() if 'symbol' not in data.columns else data.copy()
+
+
+def _price_multiple(df, multiple, acct=None):
+    if acct is not None:
+        return df['Price'] / df[acct]
+    if multiple == 'PER':
+        return df['Price'] / df['EPS']
+    if multiple == 'PBR':
+        return df['Price'] * df['Shares'] / df['Shareholders Equity']
+    if multiple == 'PSR':
+        return df['Price'] * df['Shares'] / df['Revenue']
+    raise ValueError('acct is required for the multiple {}'.format(multiple))
+
+
+def fn_asof(data, prices, accts=None, lag=3):
+    '''
+    Align quarterly financial data to daily prices as they were known at each date
+    :param data: Dictionary of term and financial data, or dataframe with term and symbol columns
+    :param prices: Dataframe of dates x symbols of daily prices
+    :param accts: Financial accounts to be aligned. ['EPS'] if not given
+    :param lag: Months after the quarter end when the financial data is available
+    :return: Dictionary of account and dataframe of dates x symbols
+    '''
+    if accts is None:
+        accts = ['EPS']
+    df = _term_symbol_panel(data)
+    df['available'] = pd.PeriodIndex(df['term'], freq='Q').end_time.normalize() + pd.DateOffset(months=lag)
+    df = df.sort_values(['available', 'term']).drop_duplicates(['available', 'symbol'], keep='last')
+    dates = pd.DatetimeIndex(prices.index)
+    rst = {}
+    for a in accts:
+        panel = df.pivot(index='available', columns='symbol', values=a)
+        # 공시 가능일과 거래일을 합친 뒤 직전 값으로 채우고 거래일만 남긴다
+        panel = panel.reindex(panel.index.union(dates)).ffill().reindex(dates)
+        rst[a] = panel.reindex(columns=prices.columns)
+    return rst
+
+
+def fn_daily_factor(data, prices, factor='PER', lag=3):
+    '''
+    Daily price multiple or yield of every company
+    :param data: Dictionary of term and financial data, or dataframe with term and symbol columns
+    :param prices: Dataframe of dates x symbols of daily prices
+    :param factor: PER, PBR, PSR or EY (earnings yield)
+    :param lag: Months after the quarter end when the financial data is available
+    :return: Dataframe of dates x symbols of the factor
+    '''
+    accts = {'PER': ['EPS'], 'EY': ['EPS'], 'PBR': ['Shares', 'Shareholders Equity'], 'PSR': ['Shares', 'Revenue']}
+    if factor not in accts:
+        raise ValueError('factor should be one of {}'.format(list(accts)))
+    panels = fn_asof(data, prices, accts[factor], lag)
+    panels['Price'] = prices
+    rst = 1 / _price_multiple(panels, 'PER') if factor == 'EY' else _price_multiple(panels, factor)
+    return rst.replace([-np.inf, np.inf], np.nan)
+
@@ -1,5 +1,10 @@
 import requests
 import pandas as pd
+try:
+    from .memory import compact
+except ImportError:
+    # python krx.py 로 직접 실행할 때
+    from memory import compact
 
 # 데이터 포맷팅
 pd.options.display.float_format = '{:,.2f}'.format
@@ -52,7 +57,14 @@ df_master = pd.concat([df_equity, df_etf, df_etn, df_elw])
 df_master = df_master[['ISU_CD', 'ISU_SRT_CD', 'ISU_ABBRV']]
 
 
-def get_ohlc_kr(symbol='000660', start_date=None, end_date=None):
+def get_ohlc_kr(symbol='000660', start_date=None, end_date=None, dtype=None):
+    '''
+    :param symbol: Symbol code or name of equity listed in KRX
+    :param start_date: The first date of period
+    :param end_date: The last date of period
+    :param dtype: 'compact' for float32 prices, nullable integer volumes, 'arrow' for arrow-backed columns
+    :return: historical open, high, low, close prices, trade volume and value, market cap, shares
+    '''
     # 종목정보 선택
     stock = df_master[df_master['ISU_SRT_CD']==symbol] if len(df_master[df_master['ISU_ABBRV']==symbol.upper()])<1 else df_master[df_master['ISU_ABBRV']==symbol.upper()]
     if len(stock) > 0:
@@ -88,12 +100,19 @@ def get_ohlc_kr(symbol='000660', start_date=None, end_date=None):
         df['Shares'] = df['Shares'].str.replace(',', '').astype(int)
 
         df.set_index('Date', inplace=True)
-        return df
+        return compact(df, dtype)
     else:
         return 'No matched result'
 
 
-def get_price_kr(symbol='000660', start_date=None, end_date=None):
+def get_price_kr(symbol='000660', start_date=None, end_date=None, dtype=None):
+    '''
+    :param symbol: Symbol code or name of equity listed in KRX
+    :param start_date: The first date of period
+    :param end_date: The last date of period
+    :param dtype: 'compact' for float32 prices, nullable integer volumes, 'arrow' for arrow-backed columns
+    :return: Historical close prices and trade volume
+    '''
     # 종목정보 선택
     stock = df_master[df_master['ISU_SRT_CD']==symbol] if len(df_master[df_master['ISU_ABBRV']==symbol.upper()])<1 else df_master[df_master['ISU_ABBRV']==symbol.upper()]
     if len(stock) > 0:
@@ -120,8 +139,10 @@ def get_price_kr(symbol='000660', start_date=None, end_date=None):
 
         df['Date'] = pd.to_datetime(df['Date'])
         df['Close'] = df['Close'].str.replace(',', '').astype(float)
-        df.rename(columns={'Close':stock['ISU_ABBRV'].iloc[0],}, inplace=True)
+        df['Volume'] = df['Volume'].str.replace(',', '').astype(int)
         df.set_index('Date', inplace=True)
+        df = compact(df, dtype)
+        df.rename(columns={'Close':stock['ISU_ABBRV'].iloc[0],}, inplace=True)
         return df
     else:
         return 'No matched result'
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# 정수로 저장할 거래량/주식수 컬럼
+_count_columns = ['Volume', 'Shares', 'avg_volume']
+# float32 로 저장할 가격 컬럼. 매출, 시가총액 같은 금액은 float32 정밀도로는 부족해 float64 로 둔다
+_price_fields = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Previous Close', 'Price', 'Price_M1', 'Price_M2', 'Price_M3']
+
+
+def compact(df, dtype='compact'):
+    '''
+    Convert a price or financial dataframe into memory efficient dtypes
+    :param df: Dataframe to be converted
+    :param dtype: 'compact' for float32 prices, nullable integer volumes and categorical text. 'arrow' for arrow-backed columns. None to keep as is
+    :return: Converted dataframe
+    '''
+    if dtype is None or not isinstance(df, pd.DataFrame):
+        return df
+    if dtype == 'arrow':
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError('pyarrow is required for arrow-backed dataframes. Try pip install pyarrow')
+        return pa.Table.from_pandas(df, preserve_index=True).to_pandas(types_mapper=pd.ArrowDtype)
+    if dtype != 'compact':
+        raise ValueError("dtype should be one of 'compact', 'arrow' or None")
+
+    rst = {}
+    for c in df.columns:
+        s = df[c]
+        if c in _count_columns and pd.api.types.is_numeric_dtype(s):
+            rst[c] = s.round().astype('Int32' if s.abs().max() < 2**31 else 'Int64')
+        elif c in _price_fields and pd.api.types.is_float_dtype(s):
+            rst[c] = s.astype('float32')
+        elif pd.api.types.is_integer_dtype(s):
+            rst[c] = pd.to_numeric(s, downcast='integer')
+        elif s.dtype == object and s.nunique() < len(s) / 2:
+            # 종목명처럼 값이 거의 유일한 컬럼은 범주형이 오히려 크다
+            rst[c] = s.astype('category')
+        else:
+            rst[c] = s
+    return pd.DataFrame(rst, index=df.index)
+
+
+def memory_report(df, dtype='compact'):
+    '''
+    Compare memory usage of each column before and after conversion
+    :param df: Dataframe to be inspected
+    :param dtype: Target of conversion. 'compact' or 'arrow'
+    :return: Dataframe of dtypes and memory usage in bytes of each column with the total
+    '''
+    conv = compact(df, dtype)
+    rst = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(deep=True, index=False),
+        dtype + '_dtype': conv.dtypes.astype(str),
+        dtype + '_bytes': conv.memory_usage(deep=True, index=False),
+    })
+    rst.loc['Total'] = ['', rst['bytes'].sum(), '', rst[dtype + '_bytes'].sum()]
+    rst['ratio'] = (rst[dtype + '_bytes'] / rst['bytes'].replace(0, np.nan)).round(3)
+    return rst
@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pandas as pd
+from . import data_prep
+from .memory import _price_fields
+
+
+def write_panel(path, data, field='Close', dtype='float32'):
+    '''
+    Save prices as a memory-mapped columnar panel
+    :param path: Directory of the panel
+    :param data: Dictionary of symbol and OHLC dataframe, or dataframe of dates x symbols
+    :param field: Field name when data is a dataframe of dates x symbols
+    :param dtype: Data type of stored prices. Other fields such as volumes and market caps are stored in float64
+    :return: PricePanel of the saved directory
+    '''
+    if isinstance(data, pd.DataFrame):
+        data = {field: data}
+        frames = None
+    else:
+        frames = {s: df for s, df in data.items() if isinstance(df, pd.DataFrame) and len(df) > 0}
+    if frames is None:
+        dates = pd.DatetimeIndex(data[field].index).sort_values()
+        symbols = list(data[field].columns)
+        fields = [field]
+    else:
+        dates = pd.DatetimeIndex(sorted(set().union(*[pd.DatetimeIndex(df.index) for df in frames.values()])))
+        symbols = list(frames)
+        fields = list(dict.fromkeys(c for df in frames.values() for c in df.columns
+                                    if pd.api.types.is_numeric_dtype(df[c])))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'dates.npy'), dates.values.astype('datetime64[ns]'))
+    np.save(os.path.join(path, 'symbols.npy'), np.array(symbols, dtype=str))
+    for f in fields:
+        # 종목 x 날짜 순서로 저장해 종목별 시계열이 연속된 메모리에 놓이게 한다
+        arr = np.lib.format.open_memmap(os.path.join(path, f + '.npy'), mode='w+', dtype=dtype if f in _price_fields else 'float64', shape=(len(symbols), len(dates)))
+        if frames is None:
+            arr[:] = data[f].reindex(dates).values.T
+        else:
+            for i, s in enumerate(symbols):
+                col = frames[s][f] if f in frames[s].columns else pd.Series(dtype=float)
+                arr[i] = col.reindex(dates).values
+        arr.flush()
+        del arr
+    return PricePanel(path)
+
+
+def build_panel(path, symbols, start_date=None, end_date=None, market='US', dtype='float32'):
+    '''
+    Download daily prices and save them as a memory-mapped columnar panel
+    :param path: Directory of the panel
+    :param symbols: Symbols or tickers of equities
+    :param start_date: The first date of period
+    :param end_date: The last date of period
+    :param market: 'US' for finance.yahoo.com, 'KR' for KRX
+    :param dtype: Data type of stored prices
+    :return: PricePanel of the saved directory
+    '''
+    frames = {}
+    if market.upper() == 'KR':
+        # krx 는 import 시 종목마스터를 내려받으므로 필요할 때만 불러온다
+        from . import krx
+        for s in symbols:
+            frames[s] = krx.get_ohlc_kr(s, start_date=start_date, end_date=end_date)
+    else:
+        start_date = pd.to_datetime(start_date).date() if start_date else None
+        end_date = pd.to_datetime(end_date).date() if end_date else None
+        for s in symbols:
+            frames[s] = data_prep._get_daily_price(s, start=start_date, end=end_date)
+    return write_panel(path, frames, dtype=dtype)
+
+
+class PricePanel:
+    '''
+    Read-only view of a memory-mapped columnar panel. Many processes can open the same directory without copying
+    :param path: Directory of the panel
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')))
+        self.symbols = pd.Index(np.load(os.path.join(path, 'symbols.npy')))
+        self.fields = sorted(f[:-4] for f in os.listdir(path) if f.endswith('.npy') and f not in ('dates.npy', 'symbols.npy'))
+        self._arrays = {}
+
+    def array(self, field='Close'):
+        '''
+        Memory-mapped array of a field
+        :param field: Field name such as Close or Volume
+        :return: Read-only array of symbols x dates
+        '''
+        if field not in self._arrays:
+            self._arrays[field] = np.load(os.path.join(self.path, field + '.npy'), mmap_mode='r')
+        return self._arrays[field]
+
+    def get(self, field='Close', symbols=None, start_date=None, end_date=None, frame=True):
+        '''
+        Slice a field by symbols and dates
+        :param field: Field name such as Close or Volume
+        :param symbols: Symbols to select. All symbols if not given
+        :param start_date: The first date of period
+        :param end_date: The last date of period
+        :param frame: Set false to get the array of dates x symbols instead of a dataframe
+        :return: Dataframe or array of dates x symbols
+        '''
+        lo = self.dates.searchsorted(pd.Timestamp(start_date)) if start_date else 0
+        hi = self.dates.searchsorted(pd.Timestamp(end_date), side='right') if end_date else len(self.dates)
+        arr = self.array(field)
+        if symbols is None:
+            rows, names = slice(None), self.symbols
+        else:
+            pos = self.symbols.get_indexer(symbols)
+            if (pos < 0).any():
+                raise KeyError('Not in the panel: {}'.format(list(np.array(symbols)[pos < 0])))
+            # 연속된 종목 구간은 슬라이스로 잘라 복사 없이 반환
+            contiguous = len(pos) > 0 and (np.diff(pos) == 1).all()
+            rows = slice(pos[0], pos[-1]+1) if contiguous else pos
+            names = self.symbols[pos]
+        values = arr[rows, lo:hi].T
+        if not frame:
+            return values
+        return pd.DataFrame(values, index=self.dates[lo:hi], columns=names, copy=False)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+def block_bootstrap(rtn, n=10000, block=20, seed=None):
+    '''
+    Generate block-bootstrapped return paths
+    :param rtn: Series of gross returns such as daily_rtn or term_rtn
+    :param n: Number of paths
+    :param block: Length of the blocks drawn together to keep autocorrelation
+    :param seed: Random seed
+    :return: 2-D array of paths x periods
+    '''
+    r = np.asarray(rtn, dtype=float)
+    r = r[~np.isnan(r)]
+    size = len(r)
+    block = max(1, min(block, size))
+    rng = np.random.default_rng(seed)
+    # 원형 블록: 시작점만 뽑고 블록 길이만큼 인덱스를 펼친다
+    starts = rng.integers(0, size, size=(n, -(-size // block)))
+    idx = (starts[:, :, None] + np.arange(block)) % size
+    return r[idx.reshape(n, -1)[:, :size]]
+
+
+def path_stats(paths, freq=252, rf_rate=.01):
+    '''
+    Calculate performance of each return path
+    :param paths: 2-D array of paths x periods of gross returns. NaN is treated as no position
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :param rf_rate: Risk free interest rate
+    :return: Dataframe of accumulated return, annual return, Sharpe ratio and MDD per path
+    '''
+    paths = np.atleast_2d(np.asarray(paths, dtype=float))
+    # NaN 은 무포지션(수익률 1)으로 보고, 기간 수는 유효한 값만 센다
+    acc = np.nancumprod(paths, axis=1)
+    size = (~np.isnan(paths)).sum(axis=1)
+    exs = paths - 1 - rf_rate / freq
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol = np.sqrt(np.nansum((exs - np.nanmean(exs, axis=1)[:, None]) ** 2, axis=1) / (size - 1))
+        sharpe = np.where(vol > 0, np.nanmean(exs, axis=1) / vol * np.sqrt(freq), 0)
+        annual = acc[:, -1] ** (freq / size)
+    return pd.DataFrame({
+        'acc_rtn': acc[:, -1],
+        'annual_rtn': annual,
+        'sharpe_ratio': sharpe,
+        'mdd': (acc / np.maximum.accumulate(acc, axis=1)).min(axis=1),
+    })
+
+
+def bootstrap_stats(rtn, n=10000, block=20, freq=252, rf_rate=.01, seed=None, chunk=2000):
+    '''
+    Calculate the distribution of performance over block-bootstrapped paths
+    :param rtn: Series of gross returns such as daily_rtn or term_rtn
+    :param n: Number of paths
+    :param block: Length of the blocks drawn together
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :param rf_rate: Risk free interest rate
+    :param seed: Random seed
+    :param chunk: Number of paths generated at once to bound memory use
+    :return: Dataframe of accumulated return, annual return, Sharpe ratio and MDD per path
+    '''
+    rng = np.random.default_rng(seed)
+    rst = []
+    for i in range(0, n, chunk):
+        paths = block_bootstrap(rtn, n=min(chunk, n - i), block=block, seed=rng)
+        rst.append(path_stats(paths, freq=freq, rf_rate=rf_rate))
+    return pd.concat(rst, ignore_index=True)
+
+
+def confidence_interval(rtn, n=10000, block=20, freq=252, rf_rate=.01, ci=.95, seed=None):
+    '''
+    Calculate bootstrap confidence intervals of performance
+    Resampled paths have no calendar, so the estimate and the bounds use the path_stats() definitions:
+    CAGR is acc_rtn ** (freq / periods) and the Sharpe ratio is the mean over the std of excess returns times sqrt(freq).
+    They differ from trading.performance() and stats.metrics() on dated returns, which annualize over calendar days
+    and divide the excess CAGR by the volatility. Compare them with metrics() of undated returns instead
+    :param rtn: Series of gross returns such as daily_rtn or term_rtn
+    :param n: Number of paths
+    :param block: Length of the blocks drawn together
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :param rf_rate: Risk free interest rate
+    :param ci: Confidence level
+    :param seed: Random seed
+    :return: Dataframe of point estimate, lower bound, median and upper bound of each metric
+    '''
+    r = np.asarray(rtn, dtype=float)
+    point = path_stats(r[~np.isnan(r)], freq=freq, rf_rate=rf_rate).iloc[0]
+    dist = bootstrap_stats(rtn, n=n, block=block, freq=freq, rf_rate=rf_rate, seed=seed)
+    q = dist.quantile([(1-ci)/2, .5, (1+ci)/2]).T
+    q.columns = ['lower', 'median', 'upper']
+    q.insert(0, 'estimate', point)
+    return q
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from . import _kernels
+
+
+def rolling_volatility(rtn, w=252, freq=252):
+    '''
+    Calculate rolling annualized volatility
+    :param rtn: Series or Dataframe of dates x strategies of gross returns such as daily_rtn or term_rtn
+    :param w: Window size
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :return: Rolling volatility in the same shape as input
+    '''
+    return (rtn - 1).rolling(w).std() * np.sqrt(freq)
+
+
+def rolling_sharpe(rtn, w=252, freq=252, rf_rate=.01):
+    '''
+    Calculate rolling Sharpe ratio
+    :param rtn: Series or Dataframe of dates x strategies of gross returns such as daily_rtn or term_rtn
+    :param w: Window size
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :param rf_rate: Risk free interest rate
+    :return: Rolling Sharpe ratio in the same shape as input
+    '''
+    exs = rtn - 1 - rf_rate / freq
+    roll = exs.rolling(w)
+    vol = roll.std()
+    return (roll.mean() / vol.where(vol > 0) * np.sqrt(freq)).fillna(0).where(vol.notna())
+
+
+def underwater(rtn):
+    '''
+    Calculate the underwater curve, the ratio of accumulated return to its running maximum
+    :param rtn: Series or Dataframe of dates x strategies of gross returns. NaN is treated as no position
+    :return: Drawdown ratio in the same shape as input. 1 at new highs
+    '''
+    acc = rtn.fillna(1).cumprod()
+    return acc / acc.cummax()
+
+
+def drawdown_duration(rtn):
+    '''
+    Count periods since the last high of accumulated return
+    :param rtn: Series or Dataframe of dates x strategies of gross returns. NaN is treated as no position
+    :return: Number of periods in drawdown in the same shape as input. 0 at new highs
+    '''
+    acc = np.asarray(rtn.fillna(1).cumprod(), dtype=float).reshape(len(rtn), -1)
+    return _like(rtn, _kernels.drawdown_duration(acc))
+
+
+def time_to_recovery(rtn):
+    '''
+    Count periods until accumulated return reaches a new high
+    :param rtn: Series or Dataframe of dates x strategies of gross returns. NaN is treated as no position
+    :return: Number of periods to the next high in the same shape as input. NaN if not recovered yet
+    '''
+    peak = _at_peak(rtn)
+    size = len(peak)
+    idx = np.arange(size)[:, None]
+    # 뒤에서부터 누적최솟값을 취하면 각 시점 이후 처음 만나는 고점 위치가 된다
+    following = np.minimum.accumulate(np.where(peak, idx, size)[::-1], axis=0)[::-1]
+    return _like(rtn, np.where(following < size, following - idx, np.nan))
+
+
+def rolling_risk(rtn, w=252, freq=252, rf_rate=.01):
+    '''
+    Calculate every rolling risk series at once
+    :param rtn: Series or Dataframe of dates x strategies of gross returns such as daily_rtn or term_rtn
+    :param w: Window size
+    :param freq: Number of periods in a year. 252 for daily_rtn, 4 for term_rtn
+    :param rf_rate: Risk free interest rate
+    :return: Dataframe with (metric, strategy) columns
+    '''
+    rtn = rtn.to_frame() if isinstance(rtn, pd.Series) else rtn
+    return pd.concat({
+        'sharpe': rolling_sharpe(rtn, w, freq, rf_rate),
+        'volatility': rolling_volatility(rtn, w, freq),
+        'underwater': underwater(rtn),
+        'dd_duration': drawdown_duration(rtn),
+        'time_to_recovery': time_to_recovery(rtn),
+    }, axis=1)
+
+
+def _at_peak(rtn):
+    acc = np.asarray(rtn.fillna(1).cumprod(), dtype=float).reshape(len(rtn), -1)
+    return acc >= np.maximum.accumulate(acc, axis=0)
+
+
+def _like(rtn, values):
+    if isinstance(rtn, pd.Series):
+        return pd.Series(values[:, 0], index=rtn.index, name=rtn.name)
+    return pd.DataFrame(values, index=rtn.index, columns=rtn.columns)
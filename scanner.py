@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from . import data_prep
+from .trend import indicators
+from .trading import indicator_to_signal, band_to_signal
+
+
+def scan(symbols, strategy, market='US', lookback=400, store=None, workers=None, flipped_only=True):
+    '''
+    Evaluate a strategy on every symbol and list the ones whose signal changed on the last day
+    :param symbols: Symbols or tickers of equities
+    :param strategy: Dictionary of indicators, rules and how to combine them.
+        ex) {'indicators': ['rsi', ('bollinger', {'w': 20, 'k': 2})],
+             'rules': [{'factor': 'rsi', 'buy': 30, 'sell': 70}, {'band': 'bollinger_20_2', 'buy': 'D', 'sell': 'B'}],
+             'how': 'and'}
+    :param market: 'US' for finance.yahoo.com, 'KR' for KRX
+    :param lookback: Number of calendar days of prices to evaluate the indicators
+    :param store: Directory to keep downloaded prices so that the next scan only downloads new days
+    :param workers: Number of processes. 1 to run in the current process
+    :param flipped_only: Set false to list every symbol
+    :return: Dataframe of the last signal of each symbol. Symbols failed to evaluate have the reason in the error column
+    '''
+    args = [(s, strategy, market, lookback, store) for s in symbols]
+    if workers == 1:
+        results = [_scan_symbol(a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_scan_symbol, args, chunksize=max(1, len(args) // (4 * (workers or os.cpu_count() or 1)))))
+
+    rst = pd.DataFrame(results, columns=['symbol', 'date', 'price', 'signal', 'prev_signal', 'flipped', 'error']).set_index('symbol')
+    rst['flipped'] = rst['flipped'].fillna(False).astype(bool)
+    if flipped_only:
+        rst = rst.loc[rst['flipped'] | rst['error'].notna()]
+    return rst.sort_values(['signal', 'date'])
+
+
+def _scan_symbol(args):
+    symbol, strategy, market, lookback, store = args
+    try:
+        df = _load_prices(symbol, market, lookback, store)
+        trade = _strategy_signal(df, strategy)
+        return {
+            'symbol': symbol,
+            'date': df.index[-1],
+            'price': df['Close'].iloc[-1],
+            'signal': trade.iloc[-1],
+            'prev_signal': trade.iloc[-2] if len(trade) > 1 else np.nan,
+            'flipped': len(trade) > 1 and trade.iloc[-1] != trade.iloc[-2],
+        }
+    except Exception as e:
+        return {'symbol': symbol, 'error': str(e)}
+
+
+def _strategy_signal(df, strategy):
+    ind = indicators(df, strategy.get('indicators', []))
+    price = ind.columns[0]
+    signals = []
+    for rule in strategy['rules']:
+        if 'band' in rule:
+            b = rule['band']
+            band = pd.DataFrame({price: ind[price], 'center': ind[b+'_center'], 'ub': ind[b+'_ub'], 'lb': ind[b+'_lb']})
+            signals.append(band_to_signal(band, rule['buy'], rule['sell']))
+        else:
+            signals.append(indicator_to_signal(ind[[price, rule['factor']]].copy(), rule['factor'], rule['buy'], rule['sell']))
+    buys = pd.concat(signals, axis=1) == 'buy'
+    buy = buys.any(axis=1) if strategy.get('how', 'and') == 'or' else buys.all(axis=1)
+    return pd.Series(np.where(buy, 'buy', 'zero'), index=ind.index)
+
+
+def _load_prices(symbol, market, lookback, store):
+    end = pd.Timestamp.today().normalize()
+    start = end - pd.Timedelta(days=lookback)
+    file = os.path.join(store, '{}_{}.csv'.format(market, symbol)) if store else None
+    old = pd.read_csv(file, index_col=0, parse_dates=True) if file and os.path.exists(file) else None
+    # 저장된 가격이 있으면 마지막 날짜부터만 받아 붙인다 (마지막 날은 장중 값일 수 있어 다시 받는다)
+    covered = old is not None and len(old) > 0 and old.index[0] <= start + pd.Timedelta(days=7)
+    since = old.index[-1] if covered else start
+    if market.upper() == 'KR':
+        # krx 는 import 시 종목마스터를 내려받으므로 필요할 때만 불러온다
+        from . import krx
+        new = krx.get_ohlc_kr(symbol, start_date=since, end_date=end)
+        if not isinstance(new, pd.DataFrame):
+            raise ValueError(new)
+    else:
+        new = data_prep._get_daily_price(symbol, start=since.date(), end=end.date())
+    df = pd.concat([old[old.index < since], new]) if covered else new
+    df = df[~df.index.duplicated(keep='last')].loc[start:]
+    if file:
+        os.makedirs(store, exist_ok=True)
+        df.to_csv(file)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List symbols whose trading signal changed on the last day')
+    parser.add_argument('strategy', help='json file of indicators, rules and how to combine them')
+    parser.add_argument('symbols', nargs='*', help='symbols or tickers of equities')
+    parser.add_argument('-f', '--symbols-file', help='text file of symbols, one per line')
+    parser.add_argument('-m', '--market', default='US', choices=['US', 'KR'])
+    parser.add_argument('-l', '--lookback', type=int, default=400, help='calendar days of prices')
+    parser.add_argument('-s', '--store', help='directory to keep downloaded prices')
+    parser.add_argument('-w', '--workers', type=int, help='number of processes')
+    parser.add_argument('-a', '--all', action='store_true', help='list every symbol, not only flipped ones')
+    parser.add_argument('-o', '--output', help='csv file to save the result')
+    args = parser.parse_args(argv)
+
+    with open(args.strategy) as f:
+        strategy = json.load(f)
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols += [line.strip() for line in f if line.strip()]
+    rst = scan(symbols, strategy, market=args.market, lookback=args.lookback, store=args.store,
+               workers=args.workers, flipped_only=not args.all)
+    if args.output:
+        rst.to_csv(args.output)
+    failed = rst['error'].notna()
+    print(rst.loc[~failed].drop(columns='error').to_string())
+    for symbol, error in rst.loc[failed, 'error'].items():
+        print('Failed: {} ({})'.format(symbol, error), file=sys.stderr)
+    return 1 if failed.all() and len(rst) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from .resampling import path_stats
+
+
+def metrics(rtn, trades=None, positions=None, freq=252, rf_rate=.01):
+    '''
+    Calculate performance of many strategies at once
+    With a date index the figures follow trading.performance(): CAGR and Sharpe ratio are annualized over calendar days / 365
+    and the Sharpe ratio is the excess CAGR over the volatility of daily excess returns.
+    financials.backtest() annualizes over years between term ends and is not reproduced.
+    Without a date index CAGR is acc_rtn ** (freq / periods) and the Sharpe ratio is the mean over the std of excess returns
+    :param rtn: Dataframe of gross returns, dates x strategies. ex) daily_rtn of each strategy
+    :param trades: Series or Dataframe of returns per trade such as rtn of evaluate(), 1 except on exit dates.
+        Columns are matched to rtn by order. Trade counts are left out if not given
+    :param positions: Series or Dataframe of position codes of position(), columns in the order of rtn.
+        Trades are counted by entries as performance() does if given, otherwise by exits in trades
+    :param freq: Number of periods in a year when rtn has no date index. 252 for daily, 4 for quarterly returns
+    :param rf_rate: Risk free interest rate
+    :return: Dataframe of accumulated return, CAGR, Sharpe ratio, MDD, and number of trades, wins and hit ratio per strategy
+    '''
+    rtn = rtn.to_frame() if isinstance(rtn, pd.Series) else rtn
+    if isinstance(rtn.index, pd.DatetimeIndex):
+        rst = _calendar_stats(rtn, rf_rate)
+    else:
+        rst = path_stats(rtn.values.T, freq=freq, rf_rate=rf_rate)
+        rst.index = rtn.columns
+
+    if trades is not None:
+        # trades 와 positions 는 컬럼 이름이 아닌 순서로 rtn 의 전략에 맞춘다
+        trades = np.asarray(trades, dtype=float).reshape(len(trades), -1)
+        closed = trades != 1
+        if positions is None:
+            rst['no_trades'] = (closed & ~np.isnan(trades)).sum(axis=0)
+        else:
+            rst['no_trades'] = (np.asarray(positions).reshape(len(positions), -1) == 'zl').sum(axis=0)
+        rst['no_win'] = (closed & (trades > 1)).sum(axis=0)
+        rst['hit_ratio'] = (rst['no_win'] / rst['no_trades'].replace(0, np.nan)).fillna(0).round(4)
+    return rst
+
+
+def _calendar_stats(rtn, rf_rate=.01):
+    # trading.performance() 와 같은 정의 (반올림 포함)를 컬럼별로 한 번에 계산
+    valid = rtn.notna()
+    first = valid.idxmax()
+    last = valid[::-1].idxmax()
+    period = (last - first).dt.days.values
+    acc = rtn.fillna(1).cumprod()
+    acc_rtn = acc.iloc[-1].values
+    exs = rtn - (rf_rate / 365 + 1)
+    vol = exs.std().values * np.sqrt(365)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(vol > 0, (_annualize(acc_rtn, period).round(4) - 1 - rf_rate) / vol, 0)
+    return pd.DataFrame({
+        'acc_rtn': acc_rtn.round(4),
+        'annual_rtn': _annualize(acc_rtn.round(4), period).round(4),
+        'sharpe_ratio': sharpe.round(4),
+        'mdd': (acc / acc.cummax()).round(4).min().values,
+    }, index=rtn.columns)
+
+
+def _annualize(rate, period):
+    # 1년 미만은 단리, 1년 초과는 복리로 연환산
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.select([period < 360, period > 365],
+                         [(rate - 1) / period * 365 + 1, rate ** (365 / period)], rate)
+
+
+def print_metrics(rst):
+    '''
+    Print the result of metrics() in readable format
+    :param rst: Dataframe from metrics()
+    :return: Formatted table
+    '''
+    pct = lambda x: '{:.2%}'.format(x - 1)
+    table = rst.to_string(formatters={
+        'acc_rtn': pct,
+        'annual_rtn': pct,
+        'mdd': pct,
+        'sharpe_ratio': '{:.2f}'.format,
+        'hit_ratio': '{:.2%}'.format,
+    })
+    print(table)
+    return table
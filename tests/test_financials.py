@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from finterstellar import financials
+
+
+def _prices(symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range('2019-01-01', '2021-06-30')
+    return pd.DataFrame(100 * np.exp(rng.normal(0, .01, (len(idx), len(symbols))).cumsum(axis=0)), index=idx, columns=symbols)
+
+
+def _check_weights(w, signal):
+    for t, selected in signal.items():
+        assert np.isclose(w.loc[t].sum(), 1)
+        assert (w.loc[t] >= 0).all()
+        assert (w.loc[t].drop(selected) == 0).all()
+
+
+def test_min_variance_long_only():
+    sub = np.array([[[1., 1.5], [1.5, 4.]], [[1., 0.], [0., 4.]]])
+    w = financials._min_variance_weights(sub, np.ones((2, 2), dtype=bool))
+    # the unconstrained solution shorts the second stock in the first term
+    np.testing.assert_allclose(w, [[1, 0], [.8, .2]], atol=1e-10)
+
+
+def test_min_variance_rank_deficient():
+    # rank one covariance, as from a window of two returns: every fully invested portfolio has the same variance
+    sub = np.ones((1, 3, 3))
+    w = financials._min_variance_weights(sub, np.ones((1, 3), dtype=bool))
+    assert np.isclose(w.sum(), 1) and (w >= 0).all()
+
+
+def test_min_variance_window_shorter_than_holdings():
+    symbols = list('ABCDEFGH')
+    signal = {'2020Q1': symbols, '2020Q2': symbols[:4]}
+    w = financials.portfolio_weights(signal, _prices(symbols), method='min_variance', window=5)
+    _check_weights(w, signal)
+
+
+def test_min_variance_identical_series():
+    prices = _prices(list('ABC'))
+    prices['D'] = prices['A']
+    signal = {'2020Q1': list('ABCD'), '2020Q2': list('ABD')}
+    w = financials.portfolio_weights(signal, prices, method='min_variance', window=60)
+    _check_weights(w, signal)
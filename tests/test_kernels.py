@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+from finterstellar import _kernels
+
+
+def _panel(seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.random((300, 6))
+    x[:5, 1] = np.nan       # listed after the first row
+    x[150, 2] = np.nan      # one missing bar
+    x[::7, 3] = np.nan      # never a complete window
+    x[:, 4] = np.nan        # no data
+    x[20:40, 5] = np.nan    # long gap
+    return x
+
+
+def _wilder_reference(x, w, seed_rows=2):
+    # single column by the definition: SMA on the first complete window (and the row after it for seed_rows=2),
+    # then recursion skipping NaN rows
+    rst = np.full(len(x), np.nan)
+    sma = pd.Series(x).rolling(w).mean().values
+    seed = None
+    for i in range(len(x)):
+        if np.isnan(x[i]):
+            continue
+        if seed is None:
+            if np.isnan(sma[i]):
+                continue
+            seed = i
+            rst[i] = sma[i]
+        elif i == seed + 1 and seed_rows > 1:
+            rst[i] = sma[i]
+        else:
+            rst[i] = (rst[~np.isnan(rst)][-1] * (w-1) + x[i]) / w
+    return rst
+
+
+@pytest.mark.parametrize('seed_rows', [1, 2])
+def test_wilder_loop_matches_numpy(seed_rows):
+    x = _panel()
+    for w in (1, 2, 14):
+        np.testing.assert_allclose(_kernels._wilder_loop(x, w, seed_rows), _kernels._wilder_numpy(x, w, seed_rows), equal_nan=True)
+
+
+@pytest.mark.parametrize('seed_rows', [1, 2])
+def test_wilder_seeds_each_column(seed_rows):
+    x = _panel()
+    rst = _kernels._wilder_loop(x, 14, seed_rows)
+    for j in range(x.shape[1]):
+        np.testing.assert_allclose(rst[:, j], _wilder_reference(x[:, j], 14, seed_rows), equal_nan=True)
+    assert np.isnan(rst[:18, 1]).all() and not np.isnan(rst[18, 1])
+    assert np.isnan(rst[150, 2]) and not np.isnan(rst[151:, 2]).any()
+    assert np.isnan(rst[:, 3]).all() and np.isnan(rst[:, 4]).all()
+
+
+def test_wilder_short_input():
+    x = np.arange(5, dtype=float).reshape(-1, 1)
+    assert np.isnan(_kernels._wilder_loop(x, 14)).all()
+    assert np.isnan(_kernels._wilder_numpy(x, 14)).all()
+
+
+def test_drawdown_duration_loop_matches_numpy():
+    rng = np.random.default_rng(1)
+    acc = np.cumprod(1 + rng.normal(0, .01, (300, 4)), axis=0)
+    acc[:10, 1] = np.nan
+    acc[100:110, 2] = np.nan
+    np.testing.assert_array_equal(_kernels._drawdown_duration_loop(acc), _kernels._drawdown_duration_numpy(acc))
+
+
+def test_drawdown_duration_values():
+    acc = np.array([[1.], [1.1], [1.], [1.05], [1.2], [1.1]])
+    np.testing.assert_array_equal(_kernels._drawdown_duration_loop(acc)[:, 0], [0, 0, 1, 2, 0, 1])
+
+
+def _held(buy, price, stop_loss=np.nan, take_profit=np.nan, max_hold=0):
+    return list(_kernels._position_loop(np.array(buy, dtype=np.bool_), np.array(price, dtype=float),
+                                        stop_loss, take_profit, max_hold))
+
+
+def test_position_follows_signal():
+    buy = [False, True, True, False, True]
+    assert _held(buy, [10] * 5) == buy
+
+
+def test_position_stop_loss_blocks_reentry():
+    buy = [True, True, True, True, False, True]
+    price = [10, 9.5, 8.9, 10, 10, 10]
+    assert _held(buy, price, stop_loss=.1) == [True, True, False, False, False, True]
+
+
+def test_position_take_profit():
+    buy = [True, True, True, True]
+    price = [10, 10.5, 11, 12]
+    assert _held(buy, price, take_profit=.1) == [True, True, False, False]
+
+
+def test_position_max_hold():
+    buy = [True] * 5 + [False, True]
+    assert _held(buy, [10] * 7, max_hold=2) == [True, True, False, False, False, False, True]
+
+
+@pytest.mark.numba
+def test_jit_kernels_match_loops():
+    numba = pytest.importorskip('numba')
+    x = _panel()
+    for seed_rows in (1, 2):
+        np.testing.assert_allclose(numba.njit(_kernels._wilder_loop)(x, 14, seed_rows), _kernels._wilder_loop(x, 14, seed_rows),
+                                   equal_nan=True)
+    acc = np.cumprod(1 + np.random.default_rng(2).normal(0, .01, (200, 3)), axis=0)
+    np.testing.assert_array_equal(numba.njit(_kernels._drawdown_duration_loop)(acc), _kernels._drawdown_duration_loop(acc))
+    buy = np.array([True, True, True, True, False, True])
+    price = np.array([10, 9.5, 8.9, 10, 10, 10], dtype=float)
+    np.testing.assert_array_equal(numba.njit(_kernels._position_loop)(buy, price, .1, np.nan, 0),
+                                  _kernels._position_loop(buy, price, .1, np.nan, 0))
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+from finterstellar import stats, trading
+
+
+def _evaluated(seed=3):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range('2015-01-01', periods=1000)
+    df = pd.DataFrame({'A': 100 * np.exp(rng.normal(0, .015, len(idx)).cumsum())}, index=idx)
+    df['trade'] = np.where(df['A'] > df['A'].rolling(20).mean(), 'buy', 'zero')
+    trading.position(df)
+    return trading.evaluate(df)
+
+
+def test_metrics_matches_performance():
+    df = _evaluated()
+    expected = trading.performance(df.copy(), verbose=False)
+    rst = stats.metrics(df['daily_rtn'], trades=df['rtn'], positions=df['position']).iloc[0]
+    for k in ['acc_rtn', 'annual_rtn', 'sharpe_ratio', 'mdd', 'no_trades', 'no_win', 'hit_ratio']:
+        assert np.isclose(rst[k], expected[k]), k
+
+
+def test_metrics_matches_columns_by_order():
+    df = _evaluated()
+    rst = stats.metrics(df[['daily_rtn']], trades=df[['rtn']].add_prefix('x'), positions=df[['position']])
+    assert rst['no_win'].iloc[0] == (df['rtn'] > 1).sum()
+    assert 'no_trades' not in stats.metrics(df['daily_rtn']).columns
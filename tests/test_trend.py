@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from finterstellar import trend
+
+
+def _ohlc(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    close = pd.Series(100 + rng.normal(0, 1, n).cumsum())
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    return high, low, close
+
+
+def test_atr_standard_wilder_seed():
+    high, low, close = _ohlc()
+    w = 14
+    prev = close.shift(1)
+    tr = np.maximum(high - low, np.maximum((high - prev).abs(), (low - prev).abs())).where(prev.notna(), high - low)
+    expected = np.full(len(tr), np.nan)
+    expected[w-1] = tr[:w].mean()
+    for i in range(w, len(tr)):
+        expected[i] = (expected[i-1] * (w-1) + tr[i]) / w
+    np.testing.assert_allclose(trend.atr(high, low, close, w).values, expected, equal_nan=True)
+
+
+def test_atr_panel_per_symbol():
+    high, low, close = _ohlc()
+    panel = lambda s: pd.concat([s, s.where(s.index >= 5)], axis=1, keys=['A', 'B'])
+    rst = trend.atr(panel(high), panel(low), panel(close))
+    # a symbol listed later starts at its own first complete window and matches its own series
+    late = trend.atr(high[5:], low[5:], close[5:])
+    np.testing.assert_allclose(rst['B'][5:].values, late.values, equal_nan=True)
+    assert rst['B'].notna().sum() == len(high) - 5 - 13
@@ -1,5 +1,8 @@
+import itertools
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from . import _kernels
 
 def __get_period(df):
     df.dropna(inplace=True)
@@ -115,12 +118,19 @@ def combine_signal_or(df, *cond):
     return df
 
 
-def position(df):
+def position(df, stop_loss=None, take_profit=None, max_hold=None):
     '''
     Determine the position of portfolio according to trading signals
     :param df: The dataframe containing trading signal
+    :param stop_loss: Loss ratio from the entry price to sell regardless of the signal. ex) .1
+    :param take_profit: Gain ratio from the entry price to sell regardless of the signal
+    :param max_hold: Maximum number of days to hold. It buys again only after the signal turns to zero.
+        Exits by stop_loss, take_profit or max_hold run as a per-row Python loop unless numba is installed
     :return: The dataframe containing trading position
     '''
+    if stop_loss is not None or take_profit is not None or max_hold is not None:
+        held = _kernels.position(df['trade']=='buy', df.iloc[:,0], stop_loss, take_profit, max_hold)
+        df['trade'] = np.where(held, 'buy', 'zero')
     df['position'] = ''
     df['position'].mask((df['trade'].shift(1)=='zero') & (df['trade']=='zero'), 'zz', inplace=True)
     df['position'].mask((df['trade'].shift(1)=='zero') & (df['trade']=='buy'), 'zl', inplace=True)
@@ -161,13 +171,33 @@ def evaluate(df, cost=.001):
     return df
 
 
-def performance(df, rf_rate=.01):
+def performance(df, rf_rate=.01, verbose=True):
     '''
     Calculate additional information of portfolio
     :param df: The dataframe with daily returns
     :param rf_rate: Risk free interest rate
+    :param verbose: Set false not to print the result
     :return: Number of trades, Number of wins, Hit ratio, Sharpe ratio, ...
     '''
+    rst = _performance_stats(df, rf_rate)
+    if not verbose:
+        return rst
+
+    print('CAGR: {:.2%}'.format(rst['annual_rtn'] - 1))
+    print('Accumulated return: {:.2%}'.format(rst['acc_rtn'] - 1))
+    print('Average return: {:.2%}'.format(rst['avg_rtn'] - 1))
+    print('Benchmark return : {:.2%}'.format(rst['bm_rtn']-1))
+    print('Number of trades: {}'.format(rst['no_trades']))
+    print('Number of win: {}'.format(rst['no_win']))
+    print('Hit ratio: {:.2%}'.format(rst['hit_ratio']))
+    print('Investment period: {:.1f}yrs'.format(rst['period']/365))
+    print('Sharpe ratio: {:.2f}'.format(rst['sharpe_ratio']))
+    print('MDD: {:.2%}'.format(rst['mdd']-1))
+    print('Benchmark MDD: {:.2%}'.format(rst['bm_mdd']-1))
+    return rst
+
+
+def _performance_stats(df, rf_rate=.01):
     rst = {}
     rst['no_trades'] = (df['position']=='zl').sum()
     rst['no_win'] = (df['rtn']>1).sum()
@@ -180,18 +210,95 @@ def performance(df, rf_rate=.01):
     rst['sharpe_ratio'] = __get_sharpe_ratio(df, rf_rate)
     rst['mdd'] = df['mdd'].min()
     rst['bm_mdd'] = df['bm_mdd'].min()
+    return rst
 
-    print('CAGR: {:.2%}'.format(rst['annual_rtn'] - 1))
-    print('Accumulated return: {:.2%}'.format(rst['acc_rtn'] - 1))
-    print('Average return: {:.2%}'.format(rst['avg_rtn'] - 1))
-    print('Benchmark return : {:.2%}'.format(rst['bm_rtn']-1))
-    print('Number of trades: {}'.format(rst['no_trades']))
-    print('Number of win: {}'.format(rst['no_win']))
-    print('Hit ratio: {:.2%}'.format(rst['hit_ratio']))
-    print('Investment period: {:.1f}yrs'.format(rst['period']/365))
-    print('Sharpe ratio: {:.2f}'.format(rst['sharpe_ratio']))
-    print('MDD: {:.2%}'.format(rst['mdd']-1))
-    print('Benchmark MDD: {:.2%}'.format(rst['bm_mdd']-1))
-    return
 
+def walk_forward(df, signal_func, params, train=756, test=252, mode='rolling', cost=.001, rf_rate=.01, by='acc_rtn', workers=None):
+    '''
+    Evaluate a trading strategy out of sample on rolling or expanding train/test folds
+    :param df: The dataframe containing stock prices to trade in the first column. Other columns such as OHLC are passed to signal_func
+    :param signal_func: Function taking (df, **params) and returning the trading signal. Define it at module level to run in processes
+    :param params: Dict of parameter names and candidate values to be searched on each train window
+    :param train: Number of rows in a train window
+    :param test: Number of rows in a test window
+    :param mode: 'rolling' slides the train window, 'expanding' grows it from the first row
+    :param cost: Transaction cost when sell
+    :param rf_rate: Risk free interest rate
+    :param by: Performance metric to pick the best parameters on train windows
+    :param workers: Number of processes. 1 to run in the current process
+    :return: Out-of-sample returns stitched over test windows, Dataframe of parameters and performance of each fold.
+        The stitched returns carry a position open at a fold boundary into the next fold, while the performance of each fold
+        is evaluated from a flat position on its own test window
+    '''
+    grid = [dict(zip(params.keys(), v)) for v in itertools.product(*params.values())]
+    folds = []
+    for i in range(train, len(df), test):
+        start = 0 if mode == 'expanding' else i - train
+        folds.append((df.iloc[start:min(i+test, len(df))].copy(), i - start, signal_func, grid, cost, rf_rate, by))
+    if len(folds) < 1:
+        raise ValueError('The data is shorter than a train window')
+
+    if workers == 1:
+        results = [_walk_forward_fold(f) for f in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_walk_forward_fold, folds))
+
+    # 폴드별 테스트 구간 신호를 이어붙여 다시 평가해 경계에서 열린 포지션을 다음 폴드로 이어간다
+    symbol = df.columns[0]
+    oos = pd.concat([r[0][[symbol, 'trade']] for r in results])
+    lead = df.iloc[[df.index.get_loc(oos.index[0]) - 1]][[symbol]].copy()
+    lead['trade'] = 'zero'
+    oos = pd.concat([lead, oos])
+    position(oos)
+    oos = evaluate(oos, cost=cost).iloc[1:]
+    oos = oos[[symbol, 'trade', 'position', 'rtn', 'daily_rtn']].copy()
+    oos['acc_rtn'] = oos['daily_rtn'].cumprod()
+    oos['acc_rtn_dp'] = ((oos['acc_rtn']-1)*100).round(2)
+    oos['mdd'] = (oos['acc_rtn'] / oos['acc_rtn'].cummax()).round(4)
+    oos['bm_mdd'] = (oos.iloc[:, 0] / oos.iloc[:, 0].cummax()).round(4)
+    fold_rst = pd.DataFrame([r[1] for r in results])
+    fold_rst.index.name = 'fold'
+    return oos, fold_rst
+
+
+def _run_strategy(df, signal_func, params, cost):
+    # 신호는 전체 컬럼으로 만들고, 평가는 첫 컬럼 가격으로만 한다
+    frame = df.iloc[:, [0]].copy()
+    frame['trade'] = signal_func(df.copy(), **params)
+    position(frame)
+    return evaluate(frame, cost=cost)
+
+
+def _walk_forward_fold(args):
+    df, split, signal_func, grid, cost, rf_rate, by = args
+    symbol = df.columns[0]
+    train = df.iloc[:split]
+
+    best, best_score = None, -np.inf
+    for p in grid:
+        score = _performance_stats(_run_strategy(train, signal_func, p, cost), rf_rate)[by]
+        if score > best_score:
+            best, best_score = p, score
+
+    # 학습구간 데이터로 지표를 워밍업한 뒤, 테스트 직전일은 무포지션으로 두고 테스트구간만 평가
+    frame = df[[symbol]].copy()
+    frame['trade'] = signal_func(df.copy(), **best)
+    frame = frame.iloc[split-1:].copy()
+    frame['trade'].iloc[0] = 'zero'
+    position(frame)
+    frame = evaluate(frame, cost=cost).iloc[1:]
+    frame['acc_rtn'] = frame['daily_rtn'].cumprod()
+    frame['mdd'] = (frame['acc_rtn'] / frame['acc_rtn'].cummax()).round(4)
+    frame['bm_mdd'] = (frame.iloc[:, 0] / frame.iloc[:, 0].cummax()).round(4)
 
+    rst = {
+        'train_start': train.index[0],
+        'train_end': train.index[-1],
+        'test_start': frame.index[0],
+        'test_end': frame.index[-1],
+        'params': best,
+        'train_' + by: best_score,
+    }
+    rst.update(_performance_stats(frame.copy(), rf_rate))
+    return frame[[symbol, 'trade', 'position', 'rtn', 'daily_rtn']], rst
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from . import _kernels
 
 def rsi(df, w=14):
     '''
@@ -12,11 +14,8 @@ def rsi(df, w=14):
     df.fillna(method='ffill', inplace=True)  # 들어온 데이터의 구멍을 메꿔준다
     if len(df) > w:
         df['diff'] = df.iloc[:,0].diff()   # 일별 가격차이 계산
-        df['au'] = df['diff'].where(df['diff']>0, 0).rolling(w).mean()
-        df['ad'] = df['diff'].where(df['diff']<0, 0).rolling(w).mean().abs()
-        for r in range(w+1, len(df)):
-            df['au'][r] = ( df['au'][r-1]*(w-1) + df['diff'].where(df['diff']>0,0)[r] ) / w
-            df['ad'][r] = ( df['ad'][r-1]*(w-1) + df['diff'].where(df['diff']<0,0).abs()[r] ) / w
+        df['au'] = _wilder(df['diff'].where(df['diff']>0, 0), w)
+        df['ad'] = _wilder(df['diff'].where(df['diff']<0, 0).abs(), w)
         df['rsi'] = (df['au'] / (df['au'] + df['ad']) * 100).round(2)
         return df[[symbol, 'rsi']]
     else:
@@ -83,7 +82,8 @@ def stochastic(df, symbol, n=14, m=3, t=3):
     :return: Dataframe of stochastic values
     '''
     try:
-        df['fast_k'] = ( ( df['Close'] - df['Low'].rolling(n).min() ) / ( df['High'].rolling(n).max() - df['Low'].rolling(n).min() ) ).round(4) * 100
+        low = rolling_min(df['Low'], n)
+        df['fast_k'] = ( ( df['Close'] - low ) / ( rolling_max(df['High'], n) - low ) ).round(4) * 100
         df['slow_k'] = df['fast_k'].rolling(m).mean().round(2)
         df['slow_d'] = df['slow_k'].rolling(t).mean().round(2)
         df.rename(columns={'Close':symbol}, inplace=True)
@@ -92,3 +92,229 @@ def stochastic(df, symbol, n=14, m=3, t=3):
     except:
         return 'Error. The stochastic indicator requires OHLC data and symbol. Try get_ohlc() to retrieve price data.'
 
+
+def rolling_min(df, w):
+    '''
+    Rolling minimum over dates in linear time
+    :param df: Series, Dataframe of dates x symbols or array of historical values
+    :param w: Window size
+    :return: Rolling minimum in the same shape as input
+    '''
+    return _rolling_extremum(df, w, np.minimum, np.inf)
+
+
+def rolling_max(df, w):
+    '''
+    Rolling maximum over dates in linear time
+    :param df: Series, Dataframe of dates x symbols or array of historical values
+    :param w: Window size
+    :return: Rolling maximum in the same shape as input
+    '''
+    return _rolling_extremum(df, w, np.maximum, -np.inf)
+
+
+def _rolling_extremum(df, w, op, fill):
+    # van Herk/Gil-Werman: 길이 w 블록마다 앞쪽 누적값과 뒤쪽 누적값을 구하면
+    # 모든 윈도우는 한 블록의 뒤쪽 누적값과 다음 블록의 앞쪽 누적값의 비교로 끝난다
+    a = np.asarray(df, dtype=float)
+    shape = a.shape
+    a = a.reshape(len(a), -1)
+    size, cols = a.shape
+    rst = np.full(a.shape, np.nan)
+    if 0 < w <= size:
+        blocks = -(-size // w)
+        padded = np.full((blocks * w, cols), fill)
+        padded[:size] = a
+        padded = padded.reshape(blocks, w, cols)
+        prefix = op.accumulate(padded, axis=1).reshape(-1, cols)
+        suffix = op.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape(-1, cols)
+        rst[w-1:] = op(suffix[:size-w+1], prefix[w-1:size])
+    rst = rst.reshape(shape)
+    if isinstance(df, pd.DataFrame):
+        return pd.DataFrame(rst, index=df.index, columns=df.columns)
+    if isinstance(df, pd.Series):
+        return pd.Series(rst, index=df.index, name=df.name)
+    return rst
+
+
+def stochastic_panel(high, low, close, n=14, m=3, t=3):
+    '''
+    Calculate stochastic indicators of many equities at once
+    :param high: Series or Dataframe of dates x symbols of high prices
+    :param low: Series or Dataframe of dates x symbols of low prices
+    :param close: Series or Dataframe of dates x symbols of close prices
+    :param n: Day length of fast k stochastic
+    :param m: Day length of slow k stochastic
+    :param t: Day length of slow d stochastic
+    :return: Dictionary of slow k and slow d values
+    '''
+    ll = rolling_min(low, n)
+    fast_k = ((close - ll) / (rolling_max(high, n) - ll)).round(4) * 100
+    slow_k = fast_k.rolling(m).mean().round(2)
+    slow_d = slow_k.rolling(t).mean().round(2)
+    return {'slow_k': slow_k, 'slow_d': slow_d}
+
+
+def donchian(high, low, w=20):
+    '''
+    Calculate Donchian channel
+    :param high: Series or Dataframe of dates x symbols of high prices
+    :param low: Series or Dataframe of dates x symbols of low prices
+    :param w: Window size
+    :return: Dictionary of center, upper band and lower band values
+    '''
+    ub = rolling_max(high, w)
+    lb = rolling_min(low, w)
+    return {'center': (ub + lb) / 2, 'ub': ub, 'lb': lb}
+
+
+def williams_r(high, low, close, w=14):
+    '''
+    Calculate Williams %R
+    :param high: Series or Dataframe of dates x symbols of high prices
+    :param low: Series or Dataframe of dates x symbols of low prices
+    :param close: Series or Dataframe of dates x symbols of close prices
+    :param w: Window size
+    :return: Williams %R values between -100 and 0
+    '''
+    hh = rolling_max(high, w)
+    return ((hh - close) / (hh - rolling_min(low, w)) * -100).round(2)
+
+
+def atr(high, low, close, w=14):
+    '''
+    Calculate Average True Range
+    :param high: Series or Dataframe of dates x symbols of high prices
+    :param low: Series or Dataframe of dates x symbols of low prices
+    :param close: Series or Dataframe of dates x symbols of close prices
+    :param w: Window size
+    :return: ATR values. Each symbol starts with the average true range of its own first complete window,
+        then follows the Wilder recursion. Missing bars stay NaN
+    '''
+    prev = close.shift(1)
+    tr = np.maximum(high - low, np.maximum((high - prev).abs(), (low - prev).abs()))
+    return _wilder(tr.where(prev.notna(), high - low), w, seed_rows=1)
+
+
+def indicators(df, specs):
+    '''
+    Calculate several indicators at once, sharing rolling and EWM intermediates between them
+    :param df: Dataframe containing historical prices. Single price column or OHLC data
+    :param specs: List of indicator names or (name, params) tuples. ex) ['rsi', ('bollinger', {'w': 20, 'k': 2})]
+    :return: Dataframe of prices and indicator values. The input dataframe is not modified
+    '''
+    g = _Graph(df)
+    rst = pd.DataFrame({g.symbol: df[g.symbol]}, index=df.index)
+    for spec in specs:
+        name, params = (spec, {}) if isinstance(spec, str) else spec
+        if name not in _pipeline:
+            raise ValueError('Unknown indicator {}. Choose from {}'.format(name, list(_pipeline)))
+        label = name if not params else '_'.join([name] + [str(v) for v in params.values()])
+        for k, v in _pipeline[name](g, **params).items():
+            rst[label + '_' + k if k else label] = v
+    return rst
+
+
+class _Graph:
+    '''
+    Dependency graph of intermediate series. Each node is computed once and reused by every indicator asking for it
+    '''
+    def __init__(self, df):
+        self.df = df
+        # OHLC 데이터는 종가, 단일 컬럼 데이터는 첫 컬럼을 가격으로 사용
+        self.symbol = 'Close' if 'Close' in df.columns else df.columns[0]
+        self.price = ('col', self.symbol)
+        self.cache = {}
+
+    def node(self, key, fn):
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return key
+
+    def value(self, key):
+        if key[0] == 'col':
+            return self.df[key[1]]
+        return self.cache[key]
+
+    def col(self, name):
+        return ('col', name)
+
+    def ffill(self, src):
+        return self.node(('ffill', src), lambda: self.value(src).fillna(method='ffill'))
+
+    def diff(self, src):
+        return self.node(('diff', src), lambda: self.value(src).diff())
+
+    def sma(self, src, w):
+        return self.node(('sma', src, w), lambda: self.value(src).rolling(w).mean())
+
+    def std(self, src, w):
+        return self.node(('std', src, w), lambda: self.value(src).rolling(w).std())
+
+    def ema(self, src, span):
+        return self.node(('ema', src, span), lambda: self.value(src).ewm(span=span).mean())
+
+    def min(self, src, w):
+        return self.node(('min', src, w), lambda: rolling_min(self.value(src), w))
+
+    def max(self, src, w):
+        return self.node(('max', src, w), lambda: rolling_max(self.value(src), w))
+
+
+def _wilder(s, w, seed_rows=2):
+    # 컬럼별 첫 완성 구간부터 단순이동평균으로 시작해 au[r] = (au[r-1]*(w-1) + x[r]) / w, NaN 행은 건너뜀
+    # rsi 는 기존 계산대로 첫 구간 다음 행까지 단순이동평균 (seed_rows=2)
+    if isinstance(s, pd.DataFrame):
+        return pd.DataFrame(_kernels.wilder(s.values, w, seed_rows), index=s.index, columns=s.columns)
+    return pd.Series(_kernels.wilder(s.values, w, seed_rows), index=s.index, name=s.name)
+
+
+def _pipe_rsi(g, w=14):
+    diff = g.diff(g.ffill(g.price))
+    au = g.value(g.node(('au', diff, w), lambda: _wilder(g.value(diff).where(g.value(diff)>0, 0), w)))
+    ad = g.value(g.node(('ad', diff, w), lambda: _wilder(g.value(diff).where(g.value(diff)<0, 0).abs(), w)))
+    return {'': (au / (au + ad) * 100).round(2)}
+
+
+def _pipe_macd(g, short=12, long=26, signal=9):
+    line = g.node(('macd', g.price, short, long), lambda: (g.value(g.ema(g.price, short)) - g.value(g.ema(g.price, long))).round(2))
+    macd_signal = g.value(g.ema(line, signal)).round(2)
+    return {'': g.value(line), 'signal': macd_signal, 'oscillator': (g.value(line) - macd_signal).round(2)}
+
+
+def _pipe_envelope(g, w=50, spread=.05):
+    center = g.value(g.sma(g.price, w))
+    return {'center': center, 'ub': center*(1+spread), 'lb': center*(1-spread)}
+
+
+def _pipe_bollinger(g, w=20, k=2):
+    center = g.value(g.sma(g.price, w))
+    sigma = g.value(g.std(g.price, w))
+    return {'center': center, 'ub': center + k * sigma, 'lb': center - k * sigma}
+
+
+def _pipe_stochastic(g, n=14, m=3, t=3):
+    low = g.value(g.min(g.col('Low'), n))
+    high = g.value(g.max(g.col('High'), n))
+    fast_k = g.node(('fast_k', n), lambda: ((g.value(g.price) - low) / (high - low)).round(4) * 100)
+    slow_k = g.node(('slow_k', n, m), lambda: g.value(g.sma(fast_k, m)).round(2))
+    return {'slow_k': g.value(slow_k), 'slow_d': g.value(g.sma(slow_k, t)).round(2)}
+
+
+def _pipe_sma(g, w=20):
+    return {'': g.value(g.sma(g.price, w))}
+
+
+def _pipe_ema(g, span=20):
+    return {'': g.value(g.ema(g.price, span))}
+
+
+_pipeline = {
+    'rsi': _pipe_rsi,
+    'macd': _pipe_macd,
+    'envelope': _pipe_envelope,
+    'bollinger': _pipe_bollinger,
+    'stochastic': _pipe_stochastic,
+    'sma': _pipe_sma,
+    'ema': _pipe_ema,
+}
@@ -126,8 +126,9 @@ def draw_price_multiple_band(df, multiple='PER', acct='EPS', log=False):
     '''
     fig, ax1 = plt.subplots()
     x = df.index
-    i_max = round((df['Price']/df[acct]).max(),1)
-    i_min = round((df['Price']/df[acct]).min(),1)
+    m = df['Price']/df[acct]
+    i_max = round(m.max(),1)
+    i_min = round(m.min(),1)
     i_3 = round(i_min+(i_max-i_min)/4*3,1)
     i_2 = round(i_min+(i_max-i_min)/2,1)
     i_1 = round(i_min+(i_max-i_min)/4,1)